@@ -0,0 +1,231 @@
+"""
+電卓のベンチマーク
+- 計算式エンジン（字句解析 + 操車場アルゴリズム + RPNの計算）とevalで、計算式1件あたりの時間を比較する
+- 初めて計算する式（キャッシュなし）と、同じ式をもう一度計算する場合（キャッシュあり）を分けて計測する
+- Decimalで計算する場合の時間を計測する
+- 1万文字の式を1文字ずつ入力し、途中結果の計算にかかる1文字あたりの時間を
+  入力の状態を更新する場合（IncrementalEvaluator）と、毎回式全体を計算し直す場合で比較する
+- 一括計算で、1行ずつ計算する場合と列全体をまとめて計算する場合（NumPy・リスト）を比較する
+- CSVファイルをチャンクごとに計算する時の速度と、使用メモリの最大値を計測する
+- キーボードで1文字入力するごとに送られるメッセージの数とバイト数を、ページ全体を更新する場合と比較する
+
+実行方法: python bench_calculator.py
+"""
+import asyncio
+import csv
+import dataclasses
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+
+import flet as ft
+
+import calc_batch
+import calculator
+from calc_batch import compile_formula, evaluate_column, evaluate_csv, evaluate_rows
+from calc_engine import IncrementalEvaluator, compile_expression, evaluate
+
+EXPRESSIONS = 10_000  # 計測に使う計算式の数
+REPEAT = 5  # 計測を繰り返す回数（最も速い回を採用）
+LENGTHS = [3, 10, 30]  # 計算式に含まれる数値の数
+LIVE_LENGTH = 10_000  # 途中結果の計測に使う式の文字数
+LIVE_WINDOW = 1_000  # 1文字あたりの時間を求める区間の文字数
+BATCH_SIZE = 1_000_000  # 一括計算の行数
+BATCH_FORMULA = "x * 1.1 + 3 / (x - 2)"  # 一括計算に使う計算式
+CSV_ROWS = 1_000_000  # CSVの計測に使う行数
+KEY_STREAM = ("12+34*5-6/7" * 20 + "Backspace " * 10).split(" ")  # キーボードで入力するキー
+
+
+def random_expression(rng, terms):
+    """電卓のボタンで入力できる形の計算式を作成"""
+    parts = [str(rng.randint(0, 999))]
+    for _ in range(terms - 1):
+        parts.append(rng.choice("+-*/"))
+        parts.append(rng.choice([str(rng.randint(1, 999)), f"{rng.uniform(0.01, 100):.2f}"]))
+    return "".join(parts)
+
+
+def best_time(func, setup=None):
+    """funcを1回実行する時間をREPEAT回計測し、最も速い時間を返す（setupは計測の外で毎回実行）"""
+    timer = timeit.Timer(func)
+    times = []
+    for _ in range(REPEAT):
+        if setup:
+            setup()
+        times.append(timer.timeit(number=1))
+    return min(times)
+
+
+def report(name, seconds, count, baseline=None, baseline_name="eval"):
+    """1件あたりの時間と、基準（baseline）と比べて何倍速いかを表示"""
+    per_op = seconds / count * 1e6
+    ratio = f"  {baseline_name}比 {baseline / seconds:.1f}倍" if baseline else ""
+    print(f"  {name:<28} {per_op:>8.2f}µs{ratio}")
+
+
+def bench_length(terms):
+    """数値の数がtermsの計算式で、evalと計算式エンジンを比較"""
+    rng = random.Random(terms)
+    expressions = [random_expression(rng, terms) for _ in range(EXPRESSIONS)]
+    print(f"数値{terms}個の計算式（例: {expressions[0][:40]}）")
+
+    eval_time = best_time(lambda: [eval(text) for text in expressions])
+    report("eval", eval_time, len(expressions))
+
+    # キャッシュに収まらない件数なので、毎回字句解析と変換から行う
+    seconds = best_time(lambda: [evaluate(text) for text in expressions], setup=compile_expression.cache_clear)
+    report("evaluate (キャッシュなし)", seconds, len(expressions), eval_time)
+
+    # 同じ式を繰り返し計算する場合（電卓で「=」を押し直す・履歴から呼び出す）
+    repeated = expressions[:100] * (EXPRESSIONS // 100)
+    eval_time = best_time(lambda: [eval(text) for text in repeated])
+    report("eval (同じ式を繰り返し)", eval_time, len(repeated))
+    seconds = best_time(lambda: [evaluate(text) for text in repeated])
+    report("evaluate (キャッシュあり)", seconds, len(repeated), eval_time)
+    seconds = best_time(lambda: [evaluate(text, True) for text in repeated])
+    report("evaluate (Decimal・キャッシュあり)", seconds, len(repeated), eval_time)
+
+
+def bench_live():
+    """1万文字の式を1文字ずつ入力し、入力位置ごとの1文字あたりの時間を比較"""
+    rng = random.Random(0)
+    text = random_expression(rng, LIVE_LENGTH)[:LIVE_LENGTH]
+    print(f"途中結果（{len(text):,}文字の式を1文字ずつ入力、{LIVE_WINDOW:,}文字ごとの1文字あたりの時間）")
+
+    def type_all():
+        live = IncrementalEvaluator()
+        elapsed = []
+        for start in range(0, len(text), LIVE_WINDOW):
+            started = timeit.default_timer()
+            for char in text[start:start + LIVE_WINDOW]:
+                live.push(char)
+                try:
+                    live.preview()
+                except ZeroDivisionError:  # 「/0.5」を入力している途中など
+                    pass
+            elapsed.append(timeit.default_timer() - started)
+        return elapsed
+
+    runs = [type_all() for _ in range(REPEAT)]
+    windows = [min(run[i] for run in runs) / LIVE_WINDOW * 1e6 for i in range(len(runs[0]))]
+    print("  IncrementalEvaluator         " + " ".join(f"{us:6.2f}" for us in windows) + " µs")
+
+    # 毎回式全体を計算し直す場合（各区間の最後の数文字で計測し、キャッシュは使わない）
+    samples = []
+    for end in range(LIVE_WINDOW, len(text) + 1, LIVE_WINDOW):
+        prefix = text[:end].rstrip("+-*/.")
+        seconds = best_time(lambda: evaluate(prefix), setup=compile_expression.cache_clear)
+        samples.append(seconds * 1e6)
+    print("  evaluate（毎回全体を計算）    " + " ".join(f"{us:6.0f}" for us in samples) + " µs")
+
+
+def bench_batch():
+    """1行ずつ計算する場合と、列全体をまとめて計算する場合を比較"""
+    rng = random.Random(0)
+    values = [float(rng.randint(0, 999)) for _ in range(BATCH_SIZE)]
+    rpn = compile_formula(BATCH_FORMULA)
+    print(f"一括計算（{BATCH_SIZE:,}行、{BATCH_FORMULA}）")
+    baseline = best_time(lambda: evaluate_rows(rpn, values))
+    report("1行ずつ計算", baseline, len(values))
+    seconds = best_time(lambda: evaluate_column(rpn, values, use_numpy=False))
+    report("列全体（リスト）", seconds, len(values), baseline, "1行ずつ")
+    if calc_batch.np is not None:
+        seconds = best_time(lambda: evaluate_column(rpn, values, use_numpy=True))
+        report("列全体（NumPy）", seconds, len(values), baseline, "1行ずつ")
+    else:
+        print("  列全体（NumPy）              NumPyがインストールされていないため省略")
+
+
+def bench_csv():
+    """CSVファイルをチャンクごとに計算する速度と、使用メモリの最大値を計測"""
+    rpn = compile_formula(BATCH_FORMULA)
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "input.csv")
+        with open(input_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "amount"])
+            writer.writerows((i, i % 1000) for i in range(CSV_ROWS))
+        size = os.path.getsize(input_path)
+        print(f"CSV（{CSV_ROWS:,}行、{size / 2**20:.1f}MB）")
+        output_path = os.path.join(tmp, "output.csv")
+        for chunk_size in [10_000, 100_000]:
+            started = time.perf_counter()
+            evaluate_csv(rpn, input_path, output_path, column=1, chunk_size=chunk_size)
+            seconds = time.perf_counter() - started
+            # メモリの計測は遅くなるので、時間とは別にもう一度実行する
+            tracemalloc.start()
+            evaluate_csv(rpn, input_path, output_path, column=1, chunk_size=chunk_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  chunk_size={chunk_size:<7,} {CSV_ROWS / seconds:>12,.0f}行/秒  最大メモリ {peak / 2**20:.1f}MB")
+
+
+class RecordingConnection:
+    """ページが送るメッセージを記録するだけの接続（Fletのサーバーなしで送信量を計測する）"""
+    def __init__(self):
+        self.pubsubhub = None
+        self.messages = []  # 送ったメッセージごとのバイト数
+        self.ids = itertools.count()
+
+    def send_commands(self, session_id, commands):
+        self.messages.append(message_size(commands))
+        # page.addに対しては、追加したコントロールのIDを返す
+        results = [" ".join(f"_{next(self.ids)}" for _ in c.commands) for c in commands if c.name == "add"]
+        return SimpleNamespace(results=results, error=None)
+
+    def send_command(self, session_id, command):
+        self.messages.append(message_size([command]))
+        return SimpleNamespace(result="", error=None)
+
+
+def message_size(commands):
+    """メッセージをJSONにした時のバイト数"""
+    return len(json.dumps([dataclasses.asdict(c) for c in commands], ensure_ascii=False).encode())
+
+
+def key_events():
+    """KEY_STREAMのキーボードイベント（1文字ずつ、最後にBackspaceを繰り返す）"""
+    keys = [key for part in KEY_STREAM for key in ([part] if part == "Backspace" else part)]
+    return [SimpleNamespace(key=key, shift=False, ctrl=False, alt=False, meta=False) for key in keys]
+
+
+def bench_keyboard():
+    """1文字入力するごとに送られるメッセージの数とバイト数を、ページ全体を更新する場合と比較"""
+    events = key_events()
+    loop = asyncio.new_event_loop()
+    print(f"キーボード入力（{len(events)}キー）")
+    for name, whole_page in [("ページ全体を更新（変更前）", True), ("変わったコントロールだけ更新", False)]:
+        conn = RecordingConnection()
+        page = ft.Page(conn, "bench", loop)
+        calculator.main(page)
+        if whole_page:
+            # 変更前と同じく、入力のたびにpage.update()でページ全体の差分を取る
+            page.update = lambda *controls: ft.Page.update(page)
+        conn.messages.clear()
+        started = time.perf_counter()
+        for e in events:
+            page.on_keyboard_event(e)
+        seconds = time.perf_counter() - started
+        count = len(events)
+        print(f"  {name:<24} {len(conn.messages) / count:.2f}件/キー {sum(conn.messages) / count:>7.0f}バイト/キー"
+              f" {seconds / count * 1e6:>8.0f}µs/キー")
+    loop.close()
+
+
+def main():
+    for terms in LENGTHS:
+        bench_length(terms)
+    bench_live()
+    bench_batch()
+    bench_csv()
+    bench_keyboard()
+
+
+if __name__ == "__main__":
+    main()
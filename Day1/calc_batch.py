@@ -0,0 +1,231 @@
+"""
+電卓の一括計算
+
+x を含む計算式（例: x * 1.1 + 3）を1回だけRPNに変換し、数値の列全体にまとめて適用します。
+NumPyがあれば配列の演算で列全体を一度に計算し、なければ演算ごとにリスト全体を処理します。
+どちらの場合も0で割った行だけを「Error」にし、1行ずつ計算した場合と同じ結果になります。
+CSVファイルはチャンクごとに読み込んで書き出すので、メモリに収まらない大きさでも計算できます。
+
+使い方:
+    python calc_batch.py "x * 1.1 + 3" input.csv [output.csv] --column 0 --chunk-size 100000
+"""
+import argparse
+import csv
+import math
+import os
+import time
+from itertools import islice
+
+from calc_engine import BINARY_OPERATORS, UNARY_OPERATORS, VARIABLE, compile_expression, evaluate_rpn
+
+try:
+    import numpy as np
+except ImportError:  # NumPyがなくても一括計算はできる（リストで計算する）
+    np = None
+
+VARIABLE_NAME = "x"  # 計算式の中で各行の値を表す文字
+CHUNK_SIZE = 100_000  # CSVを一度に読み込む行数
+ERROR = "Error"  # 計算できなかった行に出力する文字列
+NAN = float("nan")
+
+
+def compile_formula(text):
+    """x を含む計算式をRPNに変換（ExpressionErrorは呼び出し側で処理する）"""
+    return compile_expression(text, False, VARIABLE_NAME)
+
+
+def parse_value(text):
+    """入力の1つの値を数値に変換（数値でなければNone）"""
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def evaluate_rows(rpn, values):
+    """1行ずつ計算する（一括計算と比較するための基準、計算できない行はNone）"""
+    results = []
+    for x in values:
+        if x is None:
+            results.append(None)
+            continue
+        try:
+            results.append(float(evaluate_rpn([x if item is VARIABLE else item for item in rpn])))
+        except ArithmeticError:
+            results.append(None)
+    return results
+
+
+def evaluate_column(rpn, values, use_numpy=None):
+    """
+    列全体をまとめて計算します。
+
+    Args:
+        rpn (tuple): compile_formulaで変換した計算式
+        values (list): 各行の値（Noneは入力が数値でなかった行）
+        use_numpy (bool | None): NumPyを使うか（Noneならインストールされていれば使う）
+
+    Returns:
+        list: 各行の結果（0で割った行と入力が数値でなかった行はNone）
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if not values:
+        return []
+    if use_numpy:
+        return _evaluate_numpy(rpn, values)
+    return _evaluate_lists(rpn, values)
+
+
+def _evaluate_numpy(rpn, values):
+    """NumPyの配列で列全体を計算"""
+    column = np.array([NAN if x is None else x for x in values], dtype=np.float64)
+    errors = np.isnan(column)  # 計算できない行
+    stack = []
+    push, pop = stack.append, stack.pop
+    with np.errstate(over="ignore", invalid="ignore"):
+        for item in rpn:
+            if item is VARIABLE:
+                push(column)
+            elif item.__class__ is not str:
+                push(item)
+            elif item in UNARY_OPERATORS:
+                push(UNARY_OPERATORS[item][1](pop()))
+            else:
+                right = pop()
+                if item == "/":
+                    # 0で割る行はErrorにし、割る数をNaNにして警告を出さずに計算を続ける
+                    zero = np.equal(right, 0)
+                    errors |= zero
+                    right = np.where(zero, NAN, right)
+                push(BINARY_OPERATORS[item][1](pop(), right))
+    result = np.broadcast_to(np.asarray(stack[0], dtype=np.float64), column.shape)
+    return [None if error else value for value, error in zip(result.tolist(), errors.tolist())]
+
+
+def _evaluate_lists(rpn, values):
+    """演算ごとにリスト全体を処理して列全体を計算（NumPyがない場合）"""
+    size = len(values)
+    column = [NAN if x is None else x for x in values]
+    errors = [x is None for x in values]  # 計算できない行
+    stack = []
+    push, pop = stack.append, stack.pop
+    for item in rpn:
+        if item is VARIABLE:
+            push(column)
+        elif item.__class__ is not str:
+            push(item)
+        elif item in UNARY_OPERATORS:
+            op, value = UNARY_OPERATORS[item][1], pop()
+            push(list(map(op, value)) if isinstance(value, list) else op(value))
+        else:
+            op, right = BINARY_OPERATORS[item][1], pop()
+            left = pop()
+            if item == "/":
+                # 0で割る行はErrorにし、割る数をNaNにして計算を続ける
+                if isinstance(right, list):
+                    errors = [error or not r for error, r in zip(errors, right)]
+                    right = [r if r else NAN for r in right]
+                elif not right:
+                    errors = [True] * size
+                    right = NAN
+            if isinstance(left, list) and isinstance(right, list):
+                push(list(map(op, left, right)))
+            elif isinstance(left, list):
+                push([op(l, right) for l in left])
+            elif isinstance(right, list):
+                push([op(left, r) for r in right])
+            else:
+                push(op(left, right))
+    result = stack[0]
+    if not isinstance(result, list):
+        result = [result] * size
+    return [None if error else float(value) for value, error in zip(result, errors)]
+
+
+def format_value(value):
+    """結果を出力用の文字列に変換"""
+    return ERROR if value is None else str(value)
+
+
+def evaluate_text(rpn, text):
+    """貼り付けられた列（1行に1つの値）を計算し、結果を1行に1つずつ返す"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    results = evaluate_column(rpn, [parse_value(line) for line in lines])
+    return "\n".join(format_value(value) for value in results)
+
+
+def evaluate_csv(rpn, input_path, output_path, column=0, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    CSVファイルのcolumn列目に計算式を適用し、元の行の末尾に結果の列を加えて書き出します。
+    chunk_size行ずつ読み込んで計算するので、ファイル全体をメモリに読み込みません。
+    1行目のcolumn列目が数値でなければ見出しとして扱います。
+
+    Args:
+        progress (Callable[[int], None] | None): チャンクを書き出すたびに、処理済みの行数を渡して呼ぶ関数
+
+    Returns:
+        int: 計算した行数
+    """
+    count = 0
+    with open(input_path, encoding="utf-8", newline="") as src, \
+            open(output_path, "w", encoding="utf-8", newline="") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        first = next(reader, None)
+        if first is None:
+            return 0
+        if parse_value(_cell(first, column)) is None:
+            writer.writerow(first + ["result"])
+            rows = reader
+        else:
+            rows = _prepend(first, reader)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            results = evaluate_column(rpn, [parse_value(_cell(row, column)) for row in chunk])
+            writer.writerows(row + [format_value(value)] for row, value in zip(chunk, results))
+            count += len(chunk)
+            if progress:
+                progress(count)
+    return count
+
+
+def _cell(row, column):
+    """行のcolumn列目（列がなければ空文字）"""
+    return row[column] if column < len(row) else ""
+
+
+def _prepend(first, rows):
+    """先頭にfirstを付け加えたイテレーター"""
+    yield first
+    yield from rows
+
+
+def default_output_path(input_path):
+    """出力先を省略した場合のパス（入力ファイル名_result.csv）"""
+    root, _ = os.path.splitext(input_path)
+    return f"{root}_result.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="計算式を数値の列にまとめて適用")
+    parser.add_argument("formula", help=f"{VARIABLE_NAME} を含む計算式（例: \"x * 1.1 + 3\"）")
+    parser.add_argument("input", help="入力のCSVファイル")
+    parser.add_argument("output", nargs="?", help="出力先（省略時は 入力ファイル名_result.csv）")
+    parser.add_argument("--column", type=int, default=0, help="計算に使う列（0から数える）")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="一度に読み込む行数")
+    args = parser.parse_args()
+
+    output_path = args.output or default_output_path(args.input)
+    started = time.perf_counter()
+    count = evaluate_csv(compile_formula(args.formula), args.input, output_path, args.column, args.chunk_size)
+    seconds = time.perf_counter() - started
+    print(f"{count:,}行を計算しました（{seconds:.2f}秒、{'NumPy' if np is not None else 'リスト'}で計算）")
+    print(f"出力先: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
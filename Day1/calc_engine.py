@@ -0,0 +1,353 @@
+"""
+電卓の計算式エンジン
+
+計算式の文字列を字句解析し、操車場アルゴリズムで逆ポーランド記法（RPN）に変換してから計算します。
+使える記号は数値・小数点・指数（1e-05 など）・四則演算（+ - * /）・符号（-3 など）・括弧だけで、evalのように任意のコードは実行されません。
+変換したRPNは計算式の文字列ごとにキャッシュするので、同じ式を何度計算しても字句解析と変換は最初の1回だけです。
+use_decimal=Trueの場合は数値をDecimalで扱い、0.1 + 0.2 が 0.3 になるような10進数の計算をします。
+
+IncrementalEvaluatorは1文字入力するごとに途中までの計算状態を更新し、式全体を解析し直さずに途中結果を返します。
+"""
+import decimal
+import math
+import operator
+import re
+from contextlib import nullcontext
+from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple
+
+DECIMAL_PRECISION = 28  # use_decimal=Trueの場合の有効桁数
+CACHE_SIZE = 1024  # RPNをキャッシュする計算式の数
+
+# 数値（float を str にした 1e-05 のような指数表記も含む）か、空白以外の1文字
+TOKEN_PATTERN = re.compile(r"(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?|\S")
+EXPONENT_CHARS = "eE"  # 指数の前に付く文字
+
+# 演算子 → (優先順位, 計算する関数)
+# neg/posは単項の符号（字句解析では区別できないので、変換時に置き換える）
+BINARY_OPERATORS = {
+    "+": (1, operator.add),
+    "-": (1, operator.sub),
+    "*": (2, operator.mul),
+    "/": (2, operator.truediv),
+}
+UNARY_OPERATORS = {
+    "neg": (3, operator.neg),
+    "pos": (3, operator.pos),
+}
+UNARY_SYMBOLS = {"-": "neg", "+": "pos"}
+# スタック上の記号 → 優先順位（開き括弧は0にして、閉じ括弧まで取り出されないようにする）
+PRECEDENCE = {"(": 0, **{name: spec[0] for name, spec in {**BINARY_OPERATORS, **UNARY_OPERATORS}.items()}}
+
+
+class ExpressionError(ValueError):
+    """計算式の書き方が正しくない"""
+
+
+class _Variable:
+    """RPNの中で変数（一括計算の x など）の位置を表す目印"""
+    def __repr__(self):
+        return "VARIABLE"
+
+
+VARIABLE = _Variable()
+
+
+def tokenize(text, variable=None):
+    """計算式を数値と記号のトークンのリストに分割（variableに指定した1文字は変数として扱う）"""
+    tokens = TOKEN_PATTERN.findall(text)
+    for token in tokens:
+        if len(token) == 1 and token not in PRECEDENCE and token not in ")0123456789" and token != variable:
+            raise ExpressionError(f"使えない文字です: {token}")
+    return tokens
+
+
+def parse_number(token, use_decimal):
+    """数値のトークンを数値に変換（evalと同じく小数点も指数もなければint、あればfloat）"""
+    if use_decimal:
+        return Decimal(token)
+    if "." in token or "e" in token or "E" in token:
+        return float(token)
+    return int(token)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text, use_decimal=False, variable=None):
+    """
+    計算式をRPN（数値と演算子名のタプル）に変換します。
+    結果は計算式ごとにキャッシュされます。
+
+    Args:
+        text (str): 計算式
+        use_decimal (bool): 数値をDecimalに変換するか
+        variable (str | None): 変数として扱う1文字（RPNではVARIABLEに置き換わる）
+
+    Returns:
+        tuple: RPN（例: "1 + 2 * 3" → (1, 2, 3, "*", "+")）
+
+    Raises:
+        ExpressionError: 計算式の書き方が正しくない場合
+    """
+    output = []
+    stack = []  # 演算子と開き括弧
+    expect_operand = True  # 次に数値（または単項の符号・開き括弧）が来るはずか
+
+    for token in tokenize(text, variable):
+        if token == "(":
+            if not expect_operand:
+                raise ExpressionError("括弧の前に演算子がありません")
+            stack.append(token)
+        elif token == ")":
+            if expect_operand:
+                raise ExpressionError("括弧の中に数値がありません")
+            while stack and stack[-1] != "(":
+                output.append(stack.pop())
+            if not stack:
+                raise ExpressionError("対応する開き括弧がありません")
+            stack.pop()
+        elif token in BINARY_OPERATORS:
+            if expect_operand:
+                if token not in UNARY_SYMBOLS:
+                    raise ExpressionError(f"演算子 {token} の前に数値がありません")
+                stack.append(UNARY_SYMBOLS[token])  # 前置の符号は右結合なのでそのまま積む
+                continue
+            precedence = BINARY_OPERATORS[token][0]
+            # 左結合なので、優先順位が同じか高い演算子を先に出力する
+            while stack and PRECEDENCE[stack[-1]] >= precedence:
+                output.append(stack.pop())
+            stack.append(token)
+            expect_operand = True
+        else:
+            if not expect_operand:
+                raise ExpressionError("数値の間に演算子がありません")
+            output.append(VARIABLE if token == variable else parse_number(token, use_decimal))
+            expect_operand = False
+
+    if expect_operand:
+        raise ExpressionError("計算式が途中で終わっています")
+    while stack:
+        token = stack.pop()
+        if token == "(":
+            raise ExpressionError("括弧が閉じられていません")
+        output.append(token)
+    return tuple(output)
+
+
+def evaluate_rpn(rpn):
+    """
+    RPNを計算します。
+    0で割った場合はZeroDivisionError（DecimalではZeroDivisionErrorのサブクラス）が発生します。
+    """
+    stack = []
+    push, pop = stack.append, stack.pop
+    for item in rpn:
+        if item.__class__ is not str:
+            push(item)
+        elif item in UNARY_OPERATORS:
+            push(UNARY_OPERATORS[item][1](pop()))
+        else:
+            right = pop()
+            push(BINARY_OPERATORS[item][1](pop(), right))
+    return stack[0]
+
+
+def evaluate(text, use_decimal=False, precision=DECIMAL_PRECISION):
+    """
+    計算式を計算して結果の数値を返します。
+
+    Args:
+        text (str): 計算式
+        use_decimal (bool): Decimalで計算するか
+        precision (int): Decimalで計算する場合の有効桁数
+
+    Raises:
+        ExpressionError: 計算式の書き方が正しくない場合
+        ArithmeticError: 0で割った場合や、結果が大きすぎる場合など、計算できない場合
+    """
+    rpn = compile_expression(text, use_decimal)
+    if not use_decimal:
+        value = evaluate_rpn(rpn)
+        # infやnanは計算式として入力し直せないので、Decimalのオーバーフローと同じくエラーにする
+        if isinstance(value, float) and not math.isfinite(value):
+            raise OverflowError("計算結果が大きすぎます")
+        return value
+    with decimal.localcontext(prec=precision):
+        return evaluate_rpn(rpn)
+
+
+def format_result(value):
+    """計算結果を表示用の文字列に変換（Decimalは末尾の0や指数表記をなくす）"""
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            return str(value)
+        text = format(value.normalize(), "f")
+        return "0" if text == "-0" else text
+    return str(value)
+
+
+class _Frame(NamedTuple):
+    """
+    括弧1段分の、途中まで入力された計算式の状態
+    加減算は項ごと、乗除算は因子ごとに左から畳み込んでおくので、evaluateと同じ順序で計算される
+    """
+    total: object = None  # 確定した項を足し引きした値
+    add_op: object = None  # totalと次の項の間の演算（operator.add / operator.sub）
+    term: object = None  # 確定した因子を掛け割りした値
+    mul_op: object = None  # termと次の因子の間の演算（operator.mul / operator.truediv）
+    signs: tuple = ()  # 次の因子に付く単項の符号（入力順）
+    number: str | None = None  # 入力中の数値
+    value: object = None  # 閉じた括弧の値（入力中の数値の代わり）
+    parent: "_Frame | None" = None  # 外側の括弧の状態
+
+
+def _has_exponent(number):
+    """入力中の数値に指数が含まれているか"""
+    return "e" in number or "E" in number
+
+
+def _fold(op, left, right):
+    """left op right（leftがまだなければright）"""
+    return right if left is None else op(left, right)
+
+
+class IncrementalEvaluator:
+    """
+    1文字ずつ入力される計算式を、入力のたびに途中まで計算しておく評価器
+    1文字あたりの処理は式の長さによらず一定で、途中結果（preview）は括弧の深さ分の計算で求まります。
+    入力ごとの状態は変更しないタプルとして積んでおくので、1文字削除（pop）も一定時間で戻せます。
+    """
+    def __init__(self, text="", use_decimal=False, precision=DECIMAL_PRECISION):
+        self.use_decimal = use_decimal  # Decimalで計算するか
+        self.precision = precision  # Decimalで計算する場合の有効桁数
+        self.states = [_Frame()]  # 1文字入力するごとの状態（エラーになった後は例外オブジェクト）
+        self.extend(text)
+
+    def __len__(self):
+        """入力された文字数"""
+        return len(self.states) - 1
+
+    def _context(self):
+        """計算に使うDecimalのコンテキスト"""
+        if self.use_decimal:
+            return decimal.localcontext(prec=self.precision)
+        return nullcontext()
+
+    def push(self, char):
+        """1文字入力"""
+        state = self.states[-1]
+        if isinstance(state, _Frame):
+            try:
+                with self._context():
+                    state = self._next(state, char)
+            except (ValueError, ArithmeticError) as e:
+                state = e  # 以降の入力は、この文字を消すまでエラーのまま
+        self.states.append(state)
+
+    def extend(self, text):
+        """複数の文字を入力"""
+        for char in text:
+            self.push(char)
+
+    def pop(self):
+        """最後の1文字を削除"""
+        if len(self.states) > 1:
+            self.states.pop()
+
+    def clear(self):
+        """入力をすべて消す"""
+        del self.states[1:]
+
+    def reset(self, text):
+        """入力を消してtextを入力し直す"""
+        self.clear()
+        self.extend(text)
+
+    def _operand(self, frame):
+        """入力中の因子の値（符号を付けたもの、まだなければNone）"""
+        value = frame.value
+        if value is None:
+            if frame.number is None or frame.number == "." or frame.number[-1] in "eE+-":
+                return None  # 「.」「1e」「1e-」のように入力の途中
+            value = parse_number(frame.number, self.use_decimal)
+        for sign in reversed(frame.signs):
+            value = sign(value)
+        return value
+
+    def _next(self, frame, char):
+        """frameにcharを入力した後の状態"""
+        if char in "0123456789.":
+            if frame.value is not None:
+                raise ExpressionError("数値の間に演算子がありません")
+            number = frame.number or ""
+            if char == "." and "." in number:
+                raise ExpressionError("小数点が2つあります")
+            if char == "." and _has_exponent(number):
+                raise ExpressionError("指数に小数点は使えません")
+            return frame._replace(number=number + char)
+        if char in EXPONENT_CHARS:
+            number = frame.number
+            if number is None or number == "." or _has_exponent(number):
+                raise ExpressionError(f"使えない文字です: {char}")
+            return frame._replace(number=number + char)
+        if char in UNARY_SYMBOLS and frame.number and frame.number[-1] in EXPONENT_CHARS:
+            return frame._replace(number=frame.number + char)  # 指数の符号（1e-05 の「-」）
+        if char.isspace():
+            return frame
+        if char in BINARY_OPERATORS:
+            operand = self._operand(frame)
+            if operand is None:
+                if frame.number is not None:
+                    raise ExpressionError("数値がありません")
+                if char not in UNARY_SYMBOLS:
+                    raise ExpressionError(f"演算子 {char} の前に数値がありません")
+                return frame._replace(signs=frame.signs + (UNARY_OPERATORS[UNARY_SYMBOLS[char]][1],))
+            # 入力中の因子を確定して、演算子の優先順位に応じて畳み込む
+            term = _fold(frame.mul_op, frame.term, operand)
+            if char in "*/":
+                return frame._replace(term=term, mul_op=BINARY_OPERATORS[char][1],
+                                      signs=(), number=None, value=None)
+            return frame._replace(total=_fold(frame.add_op, frame.total, term), add_op=BINARY_OPERATORS[char][1],
+                                  term=None, mul_op=None, signs=(), number=None, value=None)
+        if char == "(":
+            if frame.number is not None or frame.value is not None:
+                raise ExpressionError("括弧の前に演算子がありません")
+            return _Frame(parent=frame)
+        if char == ")":
+            if frame.parent is None:
+                raise ExpressionError("対応する開き括弧がありません")
+            if self._operand(frame) is None:
+                raise ExpressionError("括弧の中に数値がありません")
+            return frame.parent._replace(value=self._close(frame))
+        raise ExpressionError(f"使えない文字です: {char}")
+
+    def _close(self, frame):
+        """frameをここで閉じた場合の値（末尾の演算子は無視する、数値が1つもなければNone）"""
+        term = frame.term
+        operand = self._operand(frame)
+        if operand is not None:
+            term = _fold(frame.mul_op, term, operand)
+        if term is None:
+            return frame.total
+        return _fold(frame.add_op, frame.total, term)
+
+    def preview(self):
+        """
+        途中結果を返します（まだ数値がなければNone）
+        末尾の演算子は無視し、閉じていない括弧は閉じたものとして計算します。
+
+        Raises:
+            ExpressionError: 計算式の書き方が正しくない場合
+            ArithmeticError: 0で割った場合など、計算できない場合
+        """
+        frame = self.states[-1]
+        if not isinstance(frame, _Frame):
+            raise frame.with_traceback(None)  # 同じ例外を何度も投げるので、前回のトレースバックは捨てる
+        with self._context():
+            value = self._close(frame)
+            while frame.parent is not None:
+                frame = frame.parent
+                if value is not None:
+                    frame = frame._replace(number=None, value=value)
+                value = self._close(frame)
+        return value
@@ -0,0 +1,128 @@
+"""
+電卓の計算履歴
+
+- ResultMemo: 計算式 → 表示する結果のLRU。同じ式をもう一度計算する時は結果をそのまま返す
+- HistoryLog: 計算履歴を1行1件のJSON Linesで追記していくファイル
+  起動時にファイル全体を読まず、末尾（新しい履歴）から必要な分だけ読み込めます。
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calc_history.jsonl")
+BLOCK_SIZE = 64 * 1024  # 履歴ファイルを末尾から読む時の1回の読み込みサイズ
+
+
+class HistoryEntry(NamedTuple):
+    """1件の計算履歴"""
+    expression: str  # 計算式
+    result: str  # 表示した結果
+    use_decimal: bool  # Decimalで計算したか
+    at: float  # 計算した日時（UNIX時間）
+
+
+class ResultMemo:
+    """
+    (計算式, Decimalで計算するか) → 表示する結果 のLRU
+    UIのイベントは別々のスレッドで呼ばれるので、ロックで守る
+    """
+    def __init__(self, maxsize=10_000):
+        self.maxsize = maxsize  # 覚えておく計算式の最大数
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0  # 覚えていた結果を使った回数
+        self.misses = 0  # 計算した回数
+
+    def get(self, key):
+        """覚えている結果を返す（なければNone）"""
+        with self.lock:
+            result = self.cache.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        """結果を覚える（最も長く使われていない式から捨てる）"""
+        with self.lock:
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+    def seed(self, key, result):
+        """
+        ファイルから読んだ古い履歴の結果を覚える
+        最も古い扱いで追加し、空きがなければ今使っている結果を捨てずに諦める
+        """
+        with self.lock:
+            if key in self.cache or len(self.cache) >= self.maxsize:
+                return
+            self.cache[key] = result
+            self.cache.move_to_end(key, last=False)
+
+
+class HistoryLog:
+    """追記専用の履歴ファイル"""
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path  # 履歴ファイルのパス
+        self.lock = threading.Lock()
+
+    def append(self, entry):
+        """履歴を1件追記"""
+        line = json.dumps(entry._asdict(), ensure_ascii=False) + "\n"
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def record(self, expression, result, use_decimal):
+        """計算した結果を履歴として追記し、そのHistoryEntryを返す"""
+        entry = HistoryEntry(expression, result, use_decimal, time.time())
+        self.append(entry)
+        return entry
+
+    def read_reverse(self):
+        """
+        履歴を新しい順に返すイテレーター
+        呼び出した時点のファイルの末尾から読むので、その後に追記した履歴は含まれない
+        """
+        try:
+            end = os.path.getsize(self.path)
+        except OSError:
+            end = 0
+        return self._read_reverse(end)
+
+    def _read_reverse(self, end):
+        """ファイルのendより前をBLOCK_SIZEずつ末尾から読み、1行ずつ新しい順に返す"""
+        if end == 0:
+            return
+        with open(self.path, "rb") as f:
+            pos = end
+            rest = b""  # 前のブロックとつながっている行の続き
+            while pos > 0:
+                size = min(BLOCK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                lines = (f.read(size) + rest).split(b"\n")
+                rest = lines.pop(0)  # ブロックの先頭は行の途中かもしれない
+                for line in reversed(lines):
+                    entry = _parse(line)
+                    if entry is not None:
+                        yield entry
+            entry = _parse(rest)
+            if entry is not None:
+                yield entry
+
+
+def _parse(line):
+    """1行をHistoryEntryに変換（空行や書き込み途中で壊れた行はNone）"""
+    if not line.strip():
+        return None
+    try:
+        return HistoryEntry(**json.loads(line))
+    except (ValueError, TypeError):
+        return None
@@ -1,5 +1,164 @@
+import csv
+import itertools
+import math
+import threading
+
 import flet as ft
 
+from calc_batch import compile_formula, default_output_path, evaluate_csv, evaluate_text
+from calc_engine import ExpressionError, IncrementalEvaluator, evaluate, format_result
+from calc_history import HistoryLog, ResultMemo
+
+# ボタンの並び（1行分ずつ）
+BUTTON_ROWS = [
+    ["7", "8", "9", "/"],
+    ["4", "5", "6", "*"],
+    ["1", "2", "3", "-"],
+    ["0", ".", "=", "+"],
+]
+BACKSPACE = "BS" # 1文字削除の入力
+
+# キーボードのキー → 電卓への入力
+KEY_INPUTS = {
+    **{key: key for key in "0123456789.+-*/()="},
+    **{f"Numpad {digit}": digit for digit in "0123456789"},
+    "Numpad Decimal": ".",
+    "Numpad Add": "+",
+    "Numpad Subtract": "-",
+    "Numpad Multiply": "*",
+    "Numpad Divide": "/",
+    "Numpad Enter": "=",
+    "Numpad Equal": "=",
+    "Enter": "=",
+    "Escape": "C",
+    "Delete": "C",
+    "Backspace": BACKSPACE,
+}
+# Shiftを押しながらのキー → 電卓への入力（USキーボードの配置）
+SHIFT_KEY_INPUTS = {"8": "*", "=": "+", "9": "(", "0": ")"}
+
+def key_to_input(e):
+    """キーボードイベントを電卓への入力に変換（電卓で使わないキーはNone）"""
+    if e.ctrl or e.alt or e.meta:
+        return None
+    if e.shift and e.key in SHIFT_KEY_INPUTS:
+        return SHIFT_KEY_INPUTS[e.key]
+    return KEY_INPUTS.get(e.key)
+
+class HistoryTape(ft.ListView):
+    """
+    計算履歴を新しい順に並べるテープ
+    表示範囲の履歴だけをコントロールにし、上下の余白で全体の高さを再現する（数万件でも軽い）
+    履歴ファイルの古い履歴は、末尾近くまでスクロールした時に続きを読み込む
+    """
+    ITEM_EXTENT = 32 # 1件あたりの高さ（px）
+    OVERSCAN = 10 # 表示範囲の前後に余分に生成する件数
+    LOAD_SIZE = 500 # 履歴ファイルから1回に読み込む件数
+
+    def __init__(self, source, on_select, memo=None, height=400):
+        super().__init__(
+            height=height,
+            width=300,
+            spacing=0,
+            on_scroll=self.scrolled, # スクロール時に表示範囲を更新
+            on_scroll_interval=50 # スクロールイベントの通知間隔（ミリ秒）
+        )
+        self.source = source # 履歴ファイルの続き（新しい順のイテレーター、読み終えたらNone）
+        self.on_select = on_select # 履歴をクリックした時に呼ぶ関数
+        self.memo = memo # 読み込んだ履歴の結果を覚えさせるResultMemo
+        self.newer = [] # 起動後に計算した履歴（古い順）
+        self.older = [] # 履歴ファイルから読み込んだ履歴（新しい順）
+        self.lock = threading.RLock() # 読み込み用のスレッドとUIのイベントから使う
+        self.first = 0 # 生成範囲の先頭位置
+        self.views = {} # 生成済みの履歴 → コントロール
+        self.top_spacer = ft.Container(height=0) # 表示範囲より上の履歴分の余白
+        self.bottom_spacer = ft.Container(height=0) # 表示範囲より下の履歴分の余白
+        self.controls = [self.top_spacer, self.bottom_spacer]
+
+    def __len__(self):
+        return len(self.newer) + len(self.older)
+
+    def entry_at(self, index):
+        """新しい方から数えてindex番目の履歴"""
+        if index < len(self.newer):
+            return self.newer[-1 - index]
+        return self.older[index - len(self.newer)]
+
+    def add(self, entry):
+        """計算した履歴を先頭に追加"""
+        with self.lock:
+            self.newer.append(entry)
+            self._render()
+
+    def load_more(self):
+        """履歴ファイルから古い履歴の続きを読み込む（読み込んだらTrue）"""
+        with self.lock:
+            if self.source is None:
+                return False
+            entries = list(itertools.islice(self.source, self.LOAD_SIZE))
+            if len(entries) < self.LOAD_SIZE:
+                self.source = None # ファイルの先頭まで読み終えた
+            self.older.extend(entries)
+            if self.memo is not None:
+                for entry in entries:
+                    self.memo.seed((entry.expression, entry.use_decimal), entry.result)
+            self._render()
+            return bool(entries)
+
+    def scrolled(self, e):
+        """スクロール位置から生成範囲を再計算し、末尾に近づいたら続きを読み込む"""
+        with self.lock:
+            first = max(0, int(e.pixels // self.ITEM_EXTENT) - self.OVERSCAN)
+            changed = first != self.first
+            self.first = first
+            if first + self._window() >= len(self) and self.load_more():
+                changed = True
+            elif changed:
+                self._render()
+        if changed:
+            self.update()
+
+    def selected(self, e):
+        """クリックされた履歴を呼び出す"""
+        self.on_select(e.control.data)
+
+    def _window(self):
+        """一度に生成する件数"""
+        return math.ceil(self.height / self.ITEM_EXTENT) + 2 * self.OVERSCAN
+
+    def _create_row(self, entry):
+        """1件の履歴を表示するコントロール"""
+        mark = "（10進）" if entry.use_decimal else ""
+        return ft.Container(
+            content=ft.Text(
+                f"{entry.expression} = {entry.result}{mark}",
+                no_wrap=True,
+                overflow=ft.TextOverflow.ELLIPSIS
+            ),
+            data=entry, # クリックした時に呼び出す履歴
+            height=self.ITEM_EXTENT,
+            padding=ft.padding.symmetric(horizontal=8),
+            on_click=self.selected
+        )
+
+    def _render(self):
+        """生成範囲の履歴だけをコントロールにする"""
+        count = self._window()
+        total = len(self)
+        first = min(self.first, max(0, total - count))
+        last = min(total, first + count)
+
+        # 生成済みのコントロールは再利用し、範囲外のものは破棄する
+        views = {}
+        for index in range(first, last):
+            entry = self.entry_at(index)
+            views[entry] = self.views.get(entry) or self._create_row(entry)
+        self.views = views
+
+        self.top_spacer.height = first * self.ITEM_EXTENT
+        self.bottom_spacer.height = (total - last) * self.ITEM_EXTENT
+        self.controls = [self.top_spacer, *views.values(), self.bottom_spacer]
+
 def main(page: ft.Page):
     page.title = "シンプル電卓"
     
@@ -11,22 +170,126 @@ def main(page: ft.Page):
         width=320 # 幅
     )
     
-    # ボタンクリック時の処理
-    def button_clicked(e):
-        data = e.control.data # ボタンのデータを取得
+    # 入力中の式の途中結果
+    preview_text = ft.Text(
+        value="", # 入力中の式の途中結果
+        text_align=ft.TextAlign.RIGHT, # 右寄せ
+        color=ft.colors.GREY_600, # 文字色
+        width=320 # 幅
+    )
+    
+    # 入力された式の途中までの計算状態（1文字ごとに更新し、式全体は解析し直さない）
+    live = IncrementalEvaluator("0")
+    
+    # 表示する式を置き換える（計算状態も入力し直す）
+    def set_display(text):
+        result.value = text
+        live.reset(text)
+    
+    # 途中結果を表示する
+    def show_preview():
+        if not preview_switch.value:
+            preview_text.value = ""
+            return
+        try:
+            value = live.preview()
+            preview_text.value = "" if value is None else f"= {format_result(value)}"
+        except (ValueError, ArithmeticError): # 式の誤り・0での割り算
+            preview_text.value = "= Error"
+    
+    # 計算方法を切り替えたら、計算状態を作り直す
+    def mode_changed(e):
+        nonlocal live
+        live = IncrementalEvaluator(result.value, decimal_switch.value)
+        show_preview()
+        page.update()
+    
+    # Decimalで計算するかの切り替え（0.1+0.2 が 0.3 になる）
+    decimal_switch = ft.Switch(label="10進数で計算", value=False, on_change=mode_changed)
+    
+    # 途中結果を表示するかの切り替え
+    preview_switch = ft.Switch(label="途中結果", value=True, on_change=mode_changed)
+    
+    # 計算結果のメモと履歴
+    memo = ResultMemo() # 同じ式は計算し直さない
+    history_log = HistoryLog() # 履歴ファイル（追記のみ）
+    
+    # 履歴をクリックしたら、その結果を表示する
+    def recall(entry):
+        set_display(entry.result)
+        show_preview()
+        page.update()
+    
+    # 履歴ファイルは起動後に新しい方から少しずつ読み込む
+    tape = HistoryTape(history_log.read_reverse(), recall, memo)
+    
+    # 計算式を計算して表示する文字列を返す（覚えている式は計算しない）
+    def calculate(expression):
+        key = (expression, decimal_switch.value)
+        value = memo.get(key)
+        if value is None:
+            try:
+                # evalは使わず、四則演算だけを解釈する計算式エンジンで計算する
+                value = format_result(evaluate(expression, decimal_switch.value))
+            except (ValueError, ArithmeticError): # 式の誤り・0での割り算
+                value = "Error"
+            memo.put(key, value)
+        return value
+    
+    # ボタン・キーボードからの1つの入力を処理し、表示が変わったコントロールを返す
+    def handle_input(data):
+        changed = [result, preview_text]
         if data == "C":
-            result.value = "0"
+            set_display("0")
         elif data == "=":
-            try:
-                result.value = str(eval(result.value)) # 計算結果を表示
-            except:
-                result.value = "Error"
+            expression = result.value
+            set_display(calculate(expression)) # 計算結果を表示
+            if result.value not in ("Error", expression): # 計算できた式だけを履歴に残す
+                tape.add(history_log.record(expression, result.value, decimal_switch.value))
+                changed.append(tape)
+        elif data == BACKSPACE:
+            if len(result.value) <= 1:
+                set_display("0")
+            else:
+                result.value = result.value[:-1]
+                live.pop() # 1つ前の計算状態に戻すだけで、式は解析し直さない
         else:
             if result.value == "0":
-                result.value = data
+                set_display(data)
             else:
                 result.value += data
-        page.update()
+                live.push(data) # 追加した1文字だけを計算状態に反映する
+        show_preview()
+        if not preview_switch.value:
+            changed.remove(preview_text)
+        return changed
+    
+    # ボタンクリック時の処理
+    def button_clicked(e):
+        # ページ全体ではなく、変わったコントロールだけを更新する
+        page.update(*handle_input(e.control.data)) # ボタンのデータを渡す
+    
+    # フォーカスがある入力欄（入力欄に打った文字は電卓に入力しない）
+    focused_field = None
+    
+    def field_focused(e):
+        nonlocal focused_field
+        focused_field = e.control
+    
+    def field_blurred(e):
+        nonlocal focused_field
+        if focused_field is e.control: # 別の入力欄に移った場合は、先に届いたフォーカスを残す
+            focused_field = None
+    
+    # キーボード入力時の処理
+    def key_pressed(e: ft.KeyboardEvent):
+        if focused_field is not None:
+            return
+        data = key_to_input(e)
+        if data is not None:
+            page.update(*handle_input(data))
+    
+    page.on_keyboard_event = key_pressed
     
     # ボタンの作成
     def create_button(text, data=None):
@@ -38,29 +301,116 @@ def main(page: ft.Page):
         )
     
     # ボタンの配置
+    page.add(
+        ft.Row([
+            ft.Container(
+                content=ft.Column([
+                    result, # 結果表示
+                    preview_text, # 途中結果
+                    # ボタンの配置
+                    *[ft.Row([create_button(text) for text in row]) for row in BUTTON_ROWS],
+                    ft.Row([
+                        create_button("C", "C"), create_button("⌫", BACKSPACE), decimal_switch
+                    ]),
+                    ft.Row([
+                        preview_switch
+                    ])
+                ]),
+                padding=20 # 余白
+            ),
+            # 計算履歴
+            ft.Column([
+                ft.Text("履歴", weight="bold"),
+                tape
+            ])
+        ], vertical_alignment=ft.CrossAxisAlignment.START)
+    )
+    
+    # 一括計算：同じ計算式（x が各行の値）を数値の列にまとめて適用する
+    formula_field = ft.TextField(label="計算式（x が各行の値）", value="x * 1.1 + 3", width=320)
+    values_field = ft.TextField(label="値（1行に1つ）", multiline=True, min_lines=6, max_lines=6, width=200)
+    results_field = ft.TextField(label="結果", multiline=True, min_lines=6, max_lines=6, width=200, read_only=True)
+    column_field = ft.TextField(label="CSVの列（0から）", value="0", width=150)
+    batch_status = ft.Text()
+    for field in (formula_field, values_field, results_field, column_field):
+        field.on_focus = field_focused
+        field.on_blur = field_blurred
+    
+    # 計算式をRPNに変換する（書き方が正しくなければNone）
+    def compile_batch_formula():
+        try:
+            rpn = compile_formula(formula_field.value)
+        except ExpressionError as ex:
+            formula_field.error_text = str(ex)
+            return None
+        formula_field.error_text = None
+        return rpn
+    
+    # 貼り付けた列を計算する
+    def batch_clicked(e):
+        rpn = compile_batch_formula()
+        if rpn is not None:
+            results_field.value = evaluate_text(rpn, values_field.value or "")
+        page.update()
+    
+    # CSVファイルを計算する（大きなファイルでも固まらないようにバックグラウンドで処理）
+    def csv_picked(e):
+        rpn = compile_batch_formula()
+        if not e.files or rpn is None:
+            page.update()
+            return
+        if not (column_field.value or "").isdigit():
+            column_field.error_text = "0以上の整数を入力してください"
+            page.update()
+            return
+        column_field.error_text = None
+        column = int(column_field.value)
+        input_path = e.files[0].path
+        output_path = default_output_path(input_path)
+        
+        def progress(count):
+            batch_status.value = f"{count:,}行を計算しました"
+            batch_status.update()
+        
+        def run():
+            try:
+                count = evaluate_csv(rpn, input_path, output_path, column, progress=progress)
+                batch_status.value = f"{count:,}行を計算しました（出力先: {output_path}）"
+            except (OSError, ValueError, csv.Error) as ex: # 読み書きできない・文字コードや形式が違う
+                batch_status.value = f"CSVファイルを処理できませんでした: {ex}"
+            batch_status.update()
+        
+        page.run_thread(run)
+    
+    csv_picker = ft.FilePicker(on_result=csv_picked)
+    page.overlay.append(csv_picker)
+    
     page.add(
         ft.Container(
             content=ft.Column([
-                result, # 結果表示
-                # ボタンの配置
+                ft.Text("一括計算", weight="bold"),
+                formula_field,
+                ft.Row([values_field, results_field], vertical_alignment=ft.CrossAxisAlignment.START),
                 ft.Row([
-                    create_button("7"), create_button("8"), create_button("9"), create_button("/")
+                    ft.ElevatedButton("一括計算", on_click=batch_clicked),
+                    ft.ElevatedButton(
+                        "CSVファイルを計算",
+                        on_click=lambda _: csv_picker.pick_files(allowed_extensions=["csv"])
+                    ),
+                    column_field
                 ]),
-                ft.Row([
-                    create_button("4"), create_button("5"), create_button("6"), create_button("*")
-                ]),
-                ft.Row([
-                    create_button("1"), create_button("2"), create_button("3"), create_button("-")
-                ]),
-                ft.Row([
-                    create_button("0"), create_button("."), create_button("="), create_button("+")
-                ]),
-                ft.Row([
-                    create_button("C", "C")
-                ])
+                batch_status
             ]),
             padding=20 # 余白
         )
     )
+    
+    # 最初のページ分の履歴をバックグラウンドで読み込む
+    def load_history():
+        if tape.load_more():
+            tape.update()
+    
+    page.run_thread(load_history)
 
-ft.app(main)
\ No newline at end of file
+if __name__ == "__main__":
+    ft.app(main)
@@ -1,6 +1,8 @@
 import flet as ft
 from flet import DragTargetAcceptEvent, border
 
+from event_pipeline import EventPipeline
+
 def main(page: ft.Page):
     page.title = "イベント処理の発展"
     
@@ -8,11 +10,31 @@ def main(page: ft.Page):
     status_text = ft.Text(size=20)
     input_status_text = ft.Text(size=20)
 
+    stats_text = ft.Text(size=14)
+
     # 1. 複数のイベントタイプ
     def handle_pointer_events(e):
-        status_text.value = f"ステータス:{e}"
+        # イベントの種類とデータだけを表示し、ページ全体ではなくstatus_textだけを更新する
+        status_text.value = f"ステータス:{e.name} {e.data or ''}"
+        status_text.update()
 
-        page.update()
+    # hoverは1秒あたりrate回まで間引いてからhandle_pointer_eventsに渡す
+    pointer_pipeline = EventPipeline(handle_pointer_events, rate=10)
+
+    def rate_changed(e):
+        pointer_pipeline.set_rate(e.control.value)
+
+    # イベントの種類ごとの件数と処理時間を表示
+    def show_stats(e):
+        lines = []
+        for kind, stats in pointer_pipeline.stats().items():
+            latency = stats["latency"]
+            lines.append(
+                f"{kind}: 受信 {stats['received']} / 処理 {stats['delivered']} / 間引き {stats['dropped']}"
+                f" / 平均 {latency['mean_us']:.0f}µs / p99 {latency['p99_us']:.0f}µs"
+            )
+        stats_text.value = "\n".join(lines) or "まだイベントがありません"
+        stats_text.update()
     
     pointer_demo = ft.Container(
         content=ft.Text("ここにマウスを重ねてください"),
@@ -21,9 +43,15 @@ def main(page: ft.Page):
         bgcolor=ft.colors.BLUE_100,
         border_radius=5,
         # 複数のイベントを登録
-        on_hover=handle_pointer_events,
-        on_click=handle_pointer_events,
-        on_long_press=handle_pointer_events,
+        on_hover=pointer_pipeline,
+        on_click=pointer_pipeline,
+        on_long_press=pointer_pipeline,
+    )
+
+    rate_slider = ft.Slider(
+        min=1, max=60, divisions=59, value=10, width=300,
+        label="hoverの処理: 毎秒{value}回まで",
+        on_change=rate_changed,
     )
 
     # 2. フォームの入力検証
@@ -88,6 +116,9 @@ def main(page: ft.Page):
         ft.Text("1. ポインターイベント", size=20, weight="bold"),
         pointer_demo,
         status_text,
+        rate_slider,
+        ft.ElevatedButton("イベントの統計を表示", on_click=show_stats),
+        stats_text,
         ft.Divider(),
 
         # 2. フォーム検証のデモ
@@ -0,0 +1,146 @@
+"""
+ポインターイベントの処理パイプライン
+
+hoverのように短い間隔で大量に届くイベントを、指定した頻度まで間引いてからハンドラーに渡します。
+間引いている間に届いたイベントは最後の1件だけを覚えておき、間隔が空いたら必ず渡すので、
+最後の状態（マウスが離れた、など）が表示されないことはありません。
+イベントの種類ごとに、届いた数・ハンドラーに渡した数・間引いた数と、ハンドラーの処理時間の分布を記録します。
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+# 処理時間のヒストグラムの区切り（マイクロ秒、最後の区間はそれ以上すべて）
+LATENCY_BUCKETS = [50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000, 50_000]
+
+
+class LatencyHistogram:
+    """ハンドラーの処理時間の分布（区間ごとの件数）"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets  # 区間の上限（マイクロ秒）
+        self.counts = [0] * (len(buckets) + 1)  # 区間ごとの件数
+        self.count = 0  # 記録した件数
+        self.total = 0.0  # 処理時間の合計（マイクロ秒）
+        self.max = 0.0  # 最大の処理時間（マイクロ秒）
+
+    def record(self, micros):
+        """処理時間を1件記録"""
+        self.counts[bisect.bisect_left(self.buckets, micros)] += 1
+        self.count += 1
+        self.total += micros
+        self.max = max(self.max, micros)
+
+    def percentile(self, p):
+        """p（0〜100）パーセンタイルが含まれる区間の上限（最後の区間なら最大値）"""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """件数・平均・パーセンタイルと区間ごとの件数"""
+        labels = [f"<{bound}µs" for bound in self.buckets] + [f"≥{self.buckets[-1]}µs"]
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": self.max,
+            "histogram": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class EventPipeline:
+    """
+    イベントをハンドラーに渡す前に、種類ごとの件数を数え、throttledの種類は頻度を制限する
+    最初のイベントはすぐに渡し、間隔内に届いたものは最後の1件だけを間隔の終わりに渡す
+    """
+    def __init__(self, handler, rate=10, throttled=("hover",)):
+        self.handler = handler  # イベントを処理する関数
+        self.interval = 1 / rate  # throttledの種類のイベントを渡す最小の間隔（秒）
+        self.throttled = set(throttled)  # 頻度を制限するイベントの種類（e.name）
+        self.lock = threading.Lock()
+        self.last_sent = {}  # イベントの種類 → 最後にハンドラーに渡した時刻
+        self.pending = {}  # イベントの種類 → 間引いている間に届いた最後のイベント
+        self.timers = {}  # イベントの種類 → 保留中のイベントを渡すタイマー
+        # 統計情報
+        self.received = defaultdict(int)  # 届いた数
+        self.delivered = defaultdict(int)  # ハンドラーに渡した数
+        self.dropped = defaultdict(int)  # 新しいイベントで置き換えて捨てた数
+        self.latency = defaultdict(LatencyHistogram)  # ハンドラーの処理時間
+
+    def set_rate(self, rate):
+        """throttledの種類のイベントを1秒あたり何回まで渡すかを変更"""
+        self.interval = 1 / rate
+
+    def __call__(self, e):
+        """コントロールのon_hoverなどにそのまま登録できる入口"""
+        kind = e.name
+        with self.lock:
+            self.received[kind] += 1
+            if kind in self.throttled:
+                wait = self.last_sent.get(kind, float("-inf")) + self.interval - time.monotonic()
+                if wait > 0:
+                    # 間隔内なので最後の1件だけを残し、間隔の終わりに渡す
+                    if kind in self.pending:
+                        self.dropped[kind] += 1
+                    self.pending[kind] = e
+                    if kind not in self.timers:
+                        timer = threading.Timer(wait, self._flush)
+                        timer.args = (kind, timer)  # どのタイマーから呼ばれたかを_flushで確認する
+                        timer.daemon = True
+                        self.timers[kind] = timer
+                        timer.start()
+                    return
+                # 間隔が空いたのに保留中のイベントがあれば（タイマーの実行が遅れている）、
+                # 新しいイベントで置き換えて捨て、後から古いイベントが渡されないようにする
+                if self.pending.pop(kind, None) is not None:
+                    self.dropped[kind] += 1
+                timer = self.timers.pop(kind, None)
+                if timer is not None:
+                    timer.cancel()
+                self.last_sent[kind] = time.monotonic()
+        self._deliver(kind, e)
+
+    def _flush(self, kind, timer):
+        """間引いている間に届いた最後のイベントを渡す"""
+        with self.lock:
+            # 取り消された古いタイマーが遅れて実行された場合は、新しいタイマーの分を横取りしない
+            if self.timers.get(kind) is not timer:
+                return
+            del self.timers[kind]
+            e = self.pending.pop(kind, None)
+            if e is None:
+                return
+            self.last_sent[kind] = time.monotonic()
+        self._deliver(kind, e)
+
+    def _deliver(self, kind, e):
+        """ハンドラーを呼び、処理時間を記録"""
+        started = time.perf_counter()
+        try:
+            self.handler(e)
+        finally:
+            micros = (time.perf_counter() - started) * 1e6
+            with self.lock:
+                self.delivered[kind] += 1
+                self.latency[kind].record(micros)
+
+    def stats(self):
+        """イベントの種類ごとの件数と処理時間"""
+        with self.lock:
+            return {
+                kind: {
+                    "received": self.received[kind],
+                    "delivered": self.delivered[kind],
+                    "dropped": self.dropped[kind],
+                    "latency": self.latency[kind].summary(),
+                }
+                for kind in sorted(self.received)
+            }
@@ -0,0 +1,267 @@
+"""
+ToDoアプリのベンチマーク
+- 通常のタスクリストと仮想化タスクリストで、タスク数ごとの描画時間を比較する
+- 編集ビューを遅延生成するTaskと、従来どおり先に生成するTaskのメモリ使用量を比較する
+- 完了タスクの一括削除・一括完了を、1件ずつ処理する場合と比較する
+- ウィンドウのドラッグで発生するリサイズイベント列を再生し、送られたUI更新の回数と時間を比較する
+- 10万件のタスク名に対する検索の応答時間を計測する
+
+実行方法: python bench_todo.py
+"""
+import asyncio
+import gc
+import itertools
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import flet as ft
+
+from todo_app_ver2 import Task, TodoApp
+from todo_model import TaskRecord
+from todo_search import SearchIndex
+
+SIZES = [100, 1_000, 5_000, 20_000]  # 計測するタスク数
+MEMORY_SIZE = 10_000  # メモリ使用量を計測するタスク数
+BULK_SIZE = 10_000  # 一括操作を計測するタスク数
+RESIZE_TASKS = 100  # リサイズの計測に使うタスク数
+WINDOW_WIDTH = 1400  # 計測に使うページの画面幅（リサイズの計測ではドラッグを始める前の幅）
+SEARCH_SIZE = 100_000  # 検索を計測するタスク数
+SEARCH_WORDS = [
+    "資料作成", "会議の準備", "メール返信", "請求書を送る", "牛乳を買う",
+    "レポート提出", "部屋の掃除", "Fletの勉強", "ジムに行く", "歯医者の予約",
+]
+SEARCH_QUERIES = ["会", "会議", "会議の準備", "flet", "#9999", "#12345", "存在しないタスク"]
+
+
+def build_app(size, virtualized):
+    """指定した件数のタスクを持つTodoAppを作成"""
+    app = TodoApp(virtualized=virtualized)
+    app.add_records(TaskRecord(f"タスク {i}") for i in range(size))
+    return app
+
+
+class RecordingConnection:
+    """ページが送るコマンドを記録するだけの接続（Fletのサーバーなしでpage.addを実行する）"""
+    def __init__(self):
+        self.pubsubhub = None
+        self.added = 0  # page.addで追加したコントロール数
+        self.ids = itertools.count()
+
+    def send_commands(self, session_id, commands):
+        # page.addに対しては、追加したコントロールのIDを返す
+        results = [" ".join(f"_{next(self.ids)}" for _ in c.commands) for c in commands if c.name == "add"]
+        self.added += sum(len(c.commands) for c in commands if c.name == "add")
+        return SimpleNamespace(results=results, error=None)
+
+    def send_command(self, session_id, command):
+        return SimpleNamespace(result="", error=None)
+
+
+def render(app, loop):
+    """ページにappを追加して初回描画を行い（コントロールにはページがIDを割り当てる）、追加したコントロール数を返す"""
+    conn = RecordingConnection()
+    page = ft.Page(conn, "bench", loop)
+    page.window.width = WINDOW_WIDTH
+    page.add(app)
+    return conn.added
+
+
+def rediff(app):
+    """変更のない状態でのUI更新（page.update相当）の差分を計算"""
+    commands = []
+    app.build_update_commands({}, commands, [], [])
+    return commands
+
+
+def bench_render():
+    """タスク数ごとの初回描画時間と再描画時間を計測"""
+    loop = asyncio.new_event_loop()
+    print(f"{'タスク数':>8} {'モード':<8} {'コントロール数':>12} {'初回描画(ms)':>12} {'再描画(ms)':>10}")
+    for size in SIZES:
+        for virtualized in (False, True):
+            app = build_app(size, virtualized)
+            gc.collect()  # ガベージコレクションの時間を計測に含めない
+            gc.disable()
+
+            start = time.perf_counter()
+            added = render(app, loop)
+            render_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            rediff(app)
+            rediff_ms = (time.perf_counter() - start) * 1000
+            gc.enable()
+
+            mode = "仮想化" if virtualized else "通常"
+            print(f"{size:>8} {mode:<8} {added:>12} {render_ms:>12.1f} {rediff_ms:>10.1f}")
+    loop.close()
+
+
+def count_controls(control):
+    """コントロールツリーに含まれるコントロール数を数える"""
+    return 1 + sum(count_controls(child) for child in control._get_children())
+
+
+def build_tasks(size, eager):
+    """指定した件数のTaskを作成（eager=Trueなら従来どおり編集ビューも作成）"""
+    tasks = []
+    for i in range(size):
+        task = Task(TaskRecord(f"タスク {i}"), None, None, None)
+        if eager:
+            task._build_edit_view()
+            task.edit_view.visible = False
+            task.controls.append(task.edit_view)
+        tasks.append(task)
+    return tasks
+
+
+def bench_memory():
+    """Task 1万件分のメモリ使用量とコントロール数を計測"""
+    print(f"{'方式':<10} {'メモリ(MB)':>10} {'1件あたり(KB)':>14} {'コントロール数':>14}")
+    for eager in (True, False):
+        gc.collect()
+        tracemalloc.start()
+        tasks = build_tasks(MEMORY_SIZE, eager)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        controls = sum(count_controls(task) for task in tasks)
+        mode = "編集ビュー先行生成" if eager else "編集ビュー遅延生成"
+        print(f"{mode:<10} {current / 1024 / 1024:>10.1f} {current / MEMORY_SIZE / 1024:>14.2f} {controls:>14}")
+        del tasks
+
+
+def build_half_completed_app(size):
+    """半分のタスクが完了済みのTodoAppを作成し、UI更新の回数を数えるようにする"""
+    app = TodoApp()
+    app.add_records(TaskRecord(f"タスク {i}", completed=i % 2 == 0) for i in range(size))
+    app.update_count = 0
+
+    def update():
+        app.update_count += 1
+
+    app.update = update
+    return app
+
+
+def clear_one_by_one(app):
+    """従来の完了タスク削除（1件ずつ削除してUI更新）"""
+    for record in list(app.completed_tasks):
+        app.remove_task(record.id)
+        app.update()
+
+
+def complete_one_by_one(app):
+    """1件ずつチェックした場合の一括完了"""
+    for record in list(app.active_tasks):
+        record.set_completed(True)
+        app.task_status_change(app.tasks.views[record.id])
+
+
+def bench_bulk():
+    """1万件のタスクに対する一括操作の時間とUI更新回数を計測"""
+    cases = [
+        ("完了項目を削除", "1件ずつ", clear_one_by_one),
+        ("完了項目を削除", "一括", lambda app: app.clear_clicked(None)),
+        ("すべて完了", "1件ずつ", complete_one_by_one),
+        ("すべて完了", "一括", lambda app: app.toggle_all_clicked(None)),
+    ]
+    print(f"{'操作':<10} {'方式':<6} {'時間(ms)':>10} {'UI更新回数':>10}")
+    for name, mode, run in cases:
+        app = build_half_completed_app(BULK_SIZE)
+        gc.collect()
+        start = time.perf_counter()
+        run(app)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{name:<10} {mode:<6} {elapsed_ms:>10.1f} {app.update_count:>10}")
+
+
+def drag_stream():
+    """ウィンドウの端をドラッグした時のリサイズイベント列（前のイベントからの間隔（秒）, 画面幅）"""
+    widths = list(range(1400, 400, -4)) + list(range(400, 1400, 4))
+    return [(0.008, width) for width in widths]
+
+
+def resize_every_event(app, e):
+    """従来のリサイズ処理（イベントごとに幅を計算してUI更新）"""
+    app._update_layout_width(e.width)
+    app.update()
+
+
+def replay_resize(handler):
+    """リサイズイベント列を再生し、UI更新の回数と更新にかかった時間を計測"""
+    app = TodoApp()
+    app.add_records(TaskRecord(f"タスク {i}") for i in range(RESIZE_TASKS))
+    loop = asyncio.new_event_loop()
+    render(app, loop)
+
+    stats = SimpleNamespace(updates=0, seconds=0.0)
+    lock = threading.Lock()
+
+    def update():
+        start = time.perf_counter()
+        rediff(app)
+        with lock:
+            stats.updates += 1
+            stats.seconds += time.perf_counter() - start
+
+    app.update = update
+    for interval, width in drag_stream():
+        start = time.perf_counter()
+        handler(app, SimpleNamespace(width=width))
+        time.sleep(max(0, interval - (time.perf_counter() - start)))
+    time.sleep(app.RESIZE_INTERVAL * 2)  # 最後に予約された更新を待つ
+    loop.close()
+    return stats
+
+
+def bench_resize():
+    """ドラッグによるリサイズイベント列を再生してUI更新の回数と時間を比較"""
+    events = len(drag_stream())
+    print(f"{'方式':<16} {'イベント数':>8} {'UI更新回数':>10} {'更新時間(ms)':>12}")
+    for name, handler in (
+        ("イベントごとに更新", resize_every_event),
+        ("区分の変化時のみ即時更新", lambda app, e: app._handle_resize(e)),
+    ):
+        stats = replay_resize(handler)
+        print(f"{name:<16} {events:>8} {stats.updates:>10} {stats.seconds * 1000:>12.1f}")
+
+
+def bench_search():
+    """10万件のタスクに対する検索インデックスの構築時間と検索の応答時間を計測"""
+    rng = random.Random(0)
+    index = SearchIndex()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(SEARCH_SIZE):
+        index.add(i, f"{rng.choice(SEARCH_WORDS)} #{i}")
+    build_ms = (time.perf_counter() - start) * 1000
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"インデックス構築: {SEARCH_SIZE}件 {build_ms:.0f}ms {memory / 1024 / 1024:.1f}MB")
+
+    print(f"{'検索語':<12} {'一致件数':>8} {'中央値(ms)':>10}")
+    for query in SEARCH_QUERIES:
+        times = []
+        for _ in range(20):
+            start = time.perf_counter()
+            matches = index.search(query)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{query:<12} {len(matches):>8} {statistics.median(times):>10.3f}")
+
+
+if __name__ == "__main__":
+    bench_render()
+    print()
+    bench_memory()
+    print()
+    bench_bulk()
+    print()
+    bench_resize()
+    print()
+    bench_search()
@@ -119,6 +119,11 @@ class TodoApp(ft.Column):
         # 残タスク数の表示
         self.items_left = ft.Text("0 項目が残っています")
 
+        # タスクの状態ごとのインデックス（更新のたびに全タスクを走査しないために保持）
+        self.active_tasks = set()  # 実行中のタスク
+        self.completed_tasks = set()  # 完了したタスク
+        self.current_status = "すべて"  # 現在表示中のフィルター
+
         # アプリケーションの幅を設定
         self.width = 600
         # メインビューのレイアウト設定
@@ -162,45 +167,63 @@ class TodoApp(ft.Column):
         if self.new_task.value:  # 入力値が存在する場合
             # 新しいタスクを作成
             task = Task(self.new_task.value, self.task_status_change, self.task_delete)
+            task.visible = self._is_visible(False, self.current_status)  # 現在のフィルターに合わせて表示
             self.tasks.controls.append(task)  # タスクリストに追加
+            self.active_tasks.add(task)  # 実行中のタスクとして登録
+            self._update_items_left()  # 残タスク数を更新
             self.new_task.value = ""  # 入力フィールドをクリア
             self.new_task.focus()  # 入力フィールドにフォーカス
             self.update()  # UI更新
 
     def task_status_change(self, task):
         """タスクの状態が変更された時の処理"""
+        # 変更されたタスクだけをインデックス間で移動する
+        if task.completed:
+            self.active_tasks.discard(task)
+            self.completed_tasks.add(task)
+        else:
+            self.completed_tasks.discard(task)
+            self.active_tasks.add(task)
+        task.visible = self._is_visible(task.completed, self.current_status)
+        self._update_items_left()  # 残タスク数を更新
         self.update()  # UI更新
 
     def task_delete(self, task):
         """タスクが削除された時の処理"""
         self.tasks.controls.remove(task)  # タスクリストから削除
+        self.active_tasks.discard(task)  # インデックスからも削除
+        self.completed_tasks.discard(task)
+        self._update_items_left()  # 残タスク数を更新
         self.update()  # UI更新
 
     def tabs_changed(self, e):
         """フィルタータブが変更された時の処理"""
+        status = self.filter.tabs[self.filter.selected_index].text  # 現在選択中のタブ
+        # 表示状態が切り替わるグループのタスクだけを更新する
+        for completed, group in ((False, self.active_tasks), (True, self.completed_tasks)):
+            visible = self._is_visible(completed, status)
+            if visible != self._is_visible(completed, self.current_status):
+                for task in group:
+                    task.visible = visible
+        self.current_status = status
         self.update()  # UI更新
 
     def clear_clicked(self, e):
         """完了タスクの一括削除処理"""
-        for task in self.tasks.controls[:]:  # タスクリストのコピーでループ
-            if task.completed:  # 完了状態のタスクのみ
-                self.task_delete(task)  # 削除
+        for task in list(self.completed_tasks):  # 完了タスクのコピーでループ
+            self.task_delete(task)  # 削除
+
+    def _is_visible(self, completed, status):
+        """指定したフィルターでタスクを表示するかどうかを判定"""
+        return (
+            status == "すべて"  # すべてのタスクを表示
+            or (status == "実行中" and not completed)  # 未完了タスクのみ表示
+            or (status == "完了" and completed)  # 完了タスクのみ表示
+        )
 
-    def before_update(self):
-        """UI更新前の処理（タスクの表示制御とカウント更新）"""
-        status = self.filter.tabs[self.filter.selected_index].text  # 現在選択中のタブ
-        count = 0  # 未完了タスクのカウンター
-        # 各タスクの表示/非表示を設定
-        for task in self.tasks.controls:
-            task.visible = (
-                status == "すべて"  # すべてのタスクを表示
-                or (status == "実行中" and task.completed == False)  # 未完了タスクのみ表示
-                or (status == "完了" and task.completed)  # 完了タスクのみ表示
-            )
-            if not task.completed:
-                count += 1  # 未完了タスクをカウント
-        # 残タスク数の表示を更新
-        self.items_left.value = f"{count} 個の実行中の項目が残っています"
+    def _update_items_left(self):
+        """残タスク数の表示を更新"""
+        self.items_left.value = f"{len(self.active_tasks)} 個の実行中の項目が残っています"
 
 
 def main(page: ft.Page):
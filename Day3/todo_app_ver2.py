@@ -1,57 +1,87 @@
+import csv
+import itertools
+import logging
+import math
+import os
+import threading
+
 import flet as ft
 
+from todo_io import chunked, read_tasks, write_tasks
+from todo_model import TaskRecord, is_visible
+from todo_search import SearchIndex
+from todo_storage import TaskStorage
+from update_scheduler import UpdateScheduler, request_update
+
+# 大量のタスクを扱う場合は仮想化リスト（表示範囲だけを生成）を使用する
+VIRTUALIZED = False
+# タスクを保存するデータベースファイル
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "todo.db")
+# UI更新をまとめて送る間隔（秒）
+UPDATE_INTERVAL = 1 / 60
+
+logger = logging.getLogger(__name__)
+
+
 class Task(ft.Column):
     """
     個々のタスクを表現するクラス
     ft.Columnを継承し、1つのToDo項目として表示される
     """
-    def __init__(self, task_name, task_status_change, task_delete):
+    def __init__(self, record, task_status_change, task_delete, task_rename):
         # 親クラス(ft.Column)の初期化
         super().__init__()
         # タスクの状態を管理する変数の初期化
-        self.completed = False  # タスクの完了状態（初期値: 未完了）
-        self.task_name = task_name  # タスク名を保存
+        self.record = record  # タスクのデータ（TaskRecord）
         self.task_status_change = task_status_change  # 状態変更時のコールバック関数
         self.task_delete = task_delete  # 削除時のコールバック関数
+        self.task_rename = task_rename  # タスク名変更時のコールバック関数
 
         # タスクの表示用チェックボックスを作成
         self.display_task = ft.Checkbox(
-            value=False,  # チェックボックスの初期状態（未チェック）
-            label=self.task_name,  # チェックボックスの横に表示されるテキスト
-            on_change=self.status_changed  # チェックボックスの状態が変更された時の処理
+            value=record.completed,  # チェックボックスの初期状態
+            label=record.name,  # チェックボックスの横に表示されるテキスト
+            on_change=self.status_changed,  # チェックボックスの状態が変更された時の処理
+            expand=True  # ボタン以外の幅いっぱいに広げ、ボタンを右端に寄せる
         )
-        # タスク名編集用のテキストフィールド
-        self.edit_name = ft.TextField(expand=1)
-
         # タスク表示用のビューを作成（通常時の表示）
+        # ボタン用の入れ子のRowを作らず、1つのRowにまとめてコントロール数を減らす
         self.display_view = ft.Row(
-            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,  # 要素を両端に配置
+            spacing=0,
             vertical_alignment=ft.CrossAxisAlignment.CENTER,  # 垂直方向に中央揃え
             controls=[
                 self.display_task,  # チェックボックスを配置
-                ft.Row(
-                    spacing=0,
-                    controls=[
-                        # 編集ボタン
-                        ft.IconButton(
-                            icon=ft.icons.CREATE_OUTLINED,
-                            tooltip="ToDoを編集",
-                            on_click=self.edit_clicked,
-                        ),
-                        # 削除ボタン
-                        ft.IconButton(
-                            ft.icons.DELETE_OUTLINE,
-                            tooltip="ToDoを削除",
-                            on_click=self.delete_clicked,
-                        ),
-                    ],
+                # 編集ボタン
+                ft.IconButton(
+                    icon=ft.icons.CREATE_OUTLINED,
+                    tooltip="ToDoを編集",
+                    on_click=self.edit_clicked,
+                ),
+                # 削除ボタン
+                ft.IconButton(
+                    ft.icons.DELETE_OUTLINE,
+                    tooltip="ToDoを削除",
+                    on_click=self.delete_clicked,
                 ),
             ],
         )
 
-        # タスク編集用のビューを作成（編集時の表示）
+        # タスク編集用のビューは編集ボタンが押された時に作成する
+        self.edit_name = None
+        self.edit_view = None
+        # 表示ビューをコントロールリストに追加
+        self.controls = [self.display_view]
+
+    @property
+    def completed(self):
+        """タスクの完了状態"""
+        return self.record.completed
+
+    def _build_edit_view(self):
+        """タスク編集用のビューを作成（編集時の表示）"""
+        # タスク名編集用のテキストフィールド
+        self.edit_name = ft.TextField(value=self.record.name, expand=1)
         self.edit_view = ft.Row(
-            visible=False,  # 初期状態では非表示
             alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             vertical_alignment=ft.CrossAxisAlignment.CENTER,
             controls=[
@@ -65,26 +95,28 @@ class Task(ft.Column):
                 ),
             ],
         )
-        # 表示ビューと編集ビューをコントロールリストに追加
-        self.controls = [self.display_view, self.edit_view]
 
     def edit_clicked(self, e):
         """編集ボタンがクリックされた時の処理"""
-        self.edit_name.value = self.display_task.label  # 現在のタスク名をテキストフィールドにセット
+        self._build_edit_view()  # 現在のタスク名をセットした編集ビューを作成
         self.display_view.visible = False  # 通常表示を非表示
-        self.edit_view.visible = True  # 編集表示を表示
-        self.update()  # UI更新
+        self.controls.append(self.edit_view)  # 編集表示を追加
+        request_update(self)  # UI更新
 
     def save_clicked(self, e):
         """保存ボタンがクリックされた時の処理"""
-        self.display_task.label = self.edit_name.value  # 編集した内容を保存
+        self.record.rename(self.edit_name.value)  # 編集した内容を保存
+        self.display_task.label = self.record.name
         self.display_view.visible = True  # 通常表示を表示
-        self.edit_view.visible = False  # 編集表示を非表示
-        self.update()  # UI更新
+        self.controls.remove(self.edit_view)  # 編集表示は破棄する
+        self.edit_name = None
+        self.edit_view = None
+        self.task_rename(self)  # コールバック関数を呼び出し
+        request_update(self)  # UI更新
 
     def status_changed(self, e):
         """チェックボックスの状態が変更された時の処理"""
-        self.completed = self.display_task.value  # 完了状態を更新
+        self.record.set_completed(self.display_task.value)  # 完了状態を更新
         self.task_status_change(self)  # コールバック関数を呼び出し
 
     def delete_clicked(self, e):
@@ -92,13 +124,217 @@ class Task(ft.Column):
         self.task_delete(self)  # 削除用コールバック関数を呼び出し
 
 
+class TaskColumn(ft.Column):
+    """
+    すべてのタスクをコントロールとして保持する通常のタスクリスト
+    フィルターはタスクのvisibleプロパティを切り替えて表現する
+    """
+    def __init__(self, create_task):
+        super().__init__()
+        self.create_task = create_task  # TaskRecordからTaskコントロールを作る関数
+        self.status = "すべて"  # 現在表示中のフィルター
+        self.matches = None  # 検索に一致したタスクIDの集合（Noneなら絞り込みなし）
+        self.views = {}  # タスクID → Taskコントロール（追加順）
+
+    def _is_shown(self, record):
+        """フィルターと検索の両方に一致するかどうか"""
+        return is_visible(record.completed, self.status) and (
+            self.matches is None or record.id in self.matches
+        )
+
+    def _get_children(self):
+        # 表示するコントロールはIDをキーにした辞書の順序で決まる（削除時にリストを走査しない）
+        return list(self.views.values())
+
+    def extend(self, records):
+        """タスクを末尾に追加"""
+        for record in records:
+            task = self.create_task(record)
+            task.visible = self._is_shown(record)  # 現在のフィルターと検索に合わせて表示
+            self.views[record.id] = task
+
+    def remove(self, record):
+        """タスクを削除"""
+        del self.views[record.id]
+
+    def remove_many(self, records):
+        """複数のタスクをまとめて削除"""
+        for record in records:
+            del self.views[record.id]
+
+    def refresh(self, record):
+        """タスク名や完了状態の変更をコントロールに反映"""
+        task = self.views[record.id]
+        task.display_task.label = record.name
+        task.display_task.value = record.completed
+
+    def status_changed(self, record):
+        """完了状態が変わったタスクの表示を更新"""
+        self.views[record.id].visible = self._is_shown(record)
+
+    def status_changed_many(self, records):
+        """完了状態が変わった複数のタスクのチェックボックスと表示を更新"""
+        for record in records:
+            task = self.views[record.id]
+            task.display_task.value = record.completed
+            task.visible = self._is_shown(record)
+
+    def set_status(self, status, active, completed):
+        """フィルターを切り替え（表示状態が切り替わるグループのタスクだけを更新する）"""
+        for done, group in ((False, active), (True, completed)):
+            visible = is_visible(done, status)
+            if visible != is_visible(done, self.status):
+                for record in group:
+                    self.views[record.id].visible = visible and (
+                        self.matches is None or record.id in self.matches
+                    )
+        self.status = status
+
+    def set_search(self, matches):
+        """検索結果を切り替え（前後の検索結果で表示が変わりうるタスクだけを更新する）"""
+        previous, self.matches = self.matches, matches
+        if previous is None and matches is None:
+            return
+        if previous is None or matches is None:
+            candidates = self.views.keys()
+        else:
+            candidates = previous ^ matches
+        for task_id in candidates:
+            task = self.views.get(task_id)
+            if task is not None:
+                task.visible = self._is_shown(task.record)
+
+
+class VirtualTaskList(ft.ListView):
+    """
+    表示範囲のタスクだけをコントロールとして生成する仮想化タスクリスト
+    範囲外のタスクはTaskRecordのまま保持し、上下の余白で全体の高さを再現する
+    """
+    ITEM_EXTENT = 56  # 1タスクあたりの高さ（px）
+    OVERSCAN = 10  # 表示範囲の前後に余分に生成するタスク数
+
+    def __init__(self, create_task, records, height=480):
+        super().__init__(
+            height=height,
+            spacing=0,
+            on_scroll=self.scrolled,  # スクロール時に表示範囲を更新
+            on_scroll_interval=50,  # スクロールイベントの通知間隔（ミリ秒）
+        )
+        self.create_task = create_task  # TaskRecordからTaskコントロールを作る関数
+        self.records = records  # すべてのタスク（タスクID → TaskRecord、TodoAppと共有）
+        self.status = "すべて"  # 現在表示中のフィルター
+        self.matches = None  # 検索に一致したタスクIDの集合（Noneなら絞り込みなし）
+        self.visible_records = {}  # フィルターと検索の適用後のタスク（タスクID → TaskRecord）
+        self.first = 0  # 生成範囲の先頭位置
+        self.views = {}  # 生成済みのタスクID → Taskコントロール
+        self.top_spacer = ft.Container(height=0)  # 表示範囲より上のタスク分の余白
+        self.bottom_spacer = ft.Container(height=0)  # 表示範囲より下のタスク分の余白
+        self.controls = [self.top_spacer, self.bottom_spacer]
+
+    def extend(self, records):
+        """タスクを末尾に追加（生成範囲の再計算は1回だけ行う）"""
+        for record in records:
+            if is_visible(record.completed, self.status) and (
+                self.matches is None or record.id in self.matches
+            ):
+                self.visible_records[record.id] = record
+        self._render()
+
+    def remove(self, record):
+        """タスクを削除"""
+        if self.visible_records.pop(record.id, None) is not None:
+            self._render()
+
+    def remove_many(self, records):
+        """複数のタスクをまとめて削除（生成範囲の再計算は1回だけ行う）"""
+        for record in records:
+            self.visible_records.pop(record.id, None)
+        self._render()
+
+    def refresh(self, record):
+        """タスク名や完了状態の変更を生成済みのコントロールに反映"""
+        task = self.views.get(record.id)
+        if task is not None:
+            task.display_task.label = record.name
+            task.display_task.value = record.completed
+
+    def status_changed(self, record):
+        """完了状態が変わったタスクを、フィルターに合わせて外すか表示に戻す"""
+        if not is_visible(record.completed, self.status):
+            self.remove(record)
+        elif record.id not in self.visible_records and (self.matches is None or record.id in self.matches):
+            self._apply_filter()  # 追加順の位置に戻すため、表示するタスクを選び直す
+
+    def status_changed_many(self, records):
+        """完了状態が変わった複数のタスクに合わせて表示範囲を作り直す"""
+        self.views = {}  # チェックボックスの状態が古いコントロールは再利用しない
+        self._apply_filter()
+
+    def set_status(self, status, active, completed):
+        """フィルターを切り替え（生成するのは表示範囲のタスクだけ）"""
+        self.status = status
+        self._apply_filter()
+
+    def set_search(self, matches):
+        """検索結果を切り替え"""
+        self.matches = matches
+        self._apply_filter()
+
+    def _apply_filter(self):
+        """フィルターと検索に一致するタスクを選び直す"""
+        if self.matches is None:
+            candidates = self.records.values()
+        else:
+            # 検索中は一致したタスクだけを見る（IDの順が追加順）
+            candidates = (self.records[task_id] for task_id in sorted(self.matches))
+        self.visible_records = {
+            record.id: record
+            for record in candidates
+            if is_visible(record.completed, self.status)
+        }
+        self._render()
+
+    def scrolled(self, e):
+        """スクロール位置から生成範囲を再計算"""
+        first = max(0, int(e.pixels // self.ITEM_EXTENT) - self.OVERSCAN)
+        if first != self.first:
+            self.first = first
+            self._render()
+            request_update(self)
+
+    def _render(self):
+        """生成範囲のタスクだけをコントロールにする"""
+        count = math.ceil(self.height / self.ITEM_EXTENT) + 2 * self.OVERSCAN
+        total = len(self.visible_records)
+        first = min(self.first, max(0, total - count))
+        last = min(total, first + count)
+
+        # 生成済みのコントロールは再利用し、範囲外のものは破棄する
+        views = {}
+        for record in itertools.islice(self.visible_records.values(), first, last):
+            task = self.views.get(record.id)
+            if task is None:
+                task = self.create_task(record)
+                task.height = self.ITEM_EXTENT
+            views[record.id] = task
+        self.views = views
+
+        self.top_spacer.height = first * self.ITEM_EXTENT
+        self.bottom_spacer.height = (total - last) * self.ITEM_EXTENT
+        self.controls = [self.top_spacer, *views.values(), self.bottom_spacer]
+
+
 class TodoApp(ft.Column):
     """
     ToDoアプリケーション全体を管理するメインクラス
     ft.Columnを継承し、アプリケーションのメインビューとなる
     """
-    def __init__(self):
+    RESIZE_INTERVAL = 0.25  # 同じブレークポイント内のリサイズを反映する間隔（秒）
+    IMPORT_CHUNK_SIZE = 1000  # インポート時に1回のUI更新でまとめて追加するタスク数
+
+    def __init__(self, virtualized=False, storage=None):
         super().__init__()  # 親クラスの初期化
+        self.storage = storage  # タスクの保存先（Noneなら保存しない）
 
         # ブレークポイントの定義
         self.BREAKPOINTS = {
@@ -112,8 +348,23 @@ class TodoApp(ft.Column):
             on_submit=self.add_clicked,  # Enterキーが押された時の処理
             expand=True  # 利用可能な幅いっぱいに広がる
         )
-        # タスクリストを表示するための列
-        self.tasks = ft.Column()
+        # すべてのタスクのデータ（タスクID → TaskRecord、追加順）
+        self.records = {}
+        # タスクのデータとインデックスを守るロック
+        # イベント処理に加え、読み込み・インポートのスレッドからも変更されるので、変更と参照はこのロックの中で行う
+        self.lock = threading.RLock()
+        # タスク名の検索用インデックスと検索ボックス
+        self.search_index = SearchIndex()
+        self.search = ft.TextField(
+            hint_text="タスクを検索",
+            prefix_icon=ft.icons.SEARCH,
+            on_change=self.search_changed,  # 入力のたびに検索
+        )
+        # タスクリストを表示するための列（仮想化モードでは表示範囲のみ生成）
+        if virtualized:
+            self.tasks = VirtualTaskList(self._create_task, self.records)
+        else:
+            self.tasks = TaskColumn(self._create_task)
 
         # フィルタータブの設定
         self.filter = ft.Tabs(
@@ -139,36 +390,85 @@ class TodoApp(ft.Column):
         # 残タスク数の表示
         self.items_left = ft.Text("0 個の実行中の項目が残っています")
 
+        # タスクの状態ごとのインデックス（更新のたびに全タスクを走査しないために保持）
+        self.active_tasks = set()  # 実行中のタスク
+        self.completed_tasks = set()  # 完了したタスク
+
+        # インポート・エクスポート用のファイル選択ダイアログと状態表示
+        self.import_picker = ft.FilePicker(on_result=self.import_result)
+        self.export_picker = ft.FilePicker(on_result=self.export_result)
+        self.io_status = ft.Text()
+
+        # リサイズ処理の状態
+        self.padding = None  # 画面幅に応じた余白
+        self.layout_bucket = None  # 現在のブレークポイントの区分
+        self.pending_width = None  # まだレイアウトに反映していない画面幅
+        self.resize_timer = None  # 同じ区分内のリサイズを反映するタイマー
+
         # UIの構築（レスポンシブ対応）
         self._build_ui()
     
     def did_mount(self):
         """コンポーネントがマウントされた後に呼ばれる"""
         self.page.on_resized = self._handle_resize
-        self._update_layout_width()
-        self.update()
+        self.page.overlay.extend([self.import_picker, self.export_picker])  # ファイル選択ダイアログを登録
+        self._update_layout_width(self.page.window.width)
+        self.page.update()
+        if self.storage:
+            # 保存済みのタスクはバックグラウンドでページ単位に読み込む
+            self.page.run_thread(self._load_tasks)
 
-    def _update_layout_width(self):
-        """画面幅に応じてレイアウト幅を更新"""
-        window_width = self.page.window.width
-        
+    def _load_tasks(self):
+        """保存済みのタスクを読み込み、1ページごとに表示を更新"""
+        for records in self.storage.load():
+            self.add_records(records)
+            request_update(self)
+
+    def _layout_bucket(self, window_width):
+        """画面幅が属するブレークポイントの区分"""
         if window_width <= self.BREAKPOINTS["MOBILE"]:
-            # モバイル: 画面幅の95%
-            self.width = window_width * 0.95
-            self.padding = 10
+            return "MOBILE"
         elif window_width <= self.BREAKPOINTS["TABLET"]:
+            return "TABLET"
+        return "DESKTOP"
+
+    def _update_layout_width(self, window_width):
+        """画面幅に応じてレイアウト幅を更新（幅か余白が変わった場合はTrueを返す）"""
+        bucket = self._layout_bucket(window_width)
+        if bucket == "MOBILE":
+            # モバイル: 画面幅の95%
+            width, padding = window_width * 0.95, 10
+        elif bucket == "TABLET":
             # タブレット: 画面幅の85%または800px
-            self.width = min(800, window_width * 0.85)
-            self.padding = 15
+            width, padding = min(800, window_width * 0.85), 15
         else:
             # デスクトップ: 画面幅の70%または1000px
-            self.width = min(1000, window_width * 0.70)
-            self.padding = 20
+            width, padding = min(1000, window_width * 0.70), 20
+
+        changed = (width, padding) != (self.width, self.padding)
+        self.width = width
+        self.padding = padding
+        self.layout_bucket = bucket
+        return changed
 
     def _handle_resize(self, e):
-        """リサイズイベントの処理"""
-        self._update_layout_width()
-        self.update()
+        """リサイズイベントの処理（ブレークポイントをまたいだ時だけすぐに更新する）"""
+        self.pending_width = e.width
+        if self._layout_bucket(e.width) != self.layout_bucket:
+            self._apply_resize()
+        elif self.resize_timer is None:
+            # 同じ区分内の幅の変化はRESIZE_INTERVALごとに最新の幅だけを反映する
+            self.resize_timer = threading.Timer(self.RESIZE_INTERVAL, self._apply_resize)
+            self.resize_timer.daemon = True
+            self.resize_timer.start()
+
+    def _apply_resize(self):
+        """最新の画面幅をレイアウトに反映（幅も余白も変わらなければ更新しない）"""
+        if self.resize_timer is not None:
+            self.resize_timer.cancel()
+            self.resize_timer = None
+        if self._update_layout_width(self.pending_width):
+            request_update(self)
 
     def _build_ui(self):
         """UIの構築"""
@@ -183,10 +483,36 @@ class TodoApp(ft.Column):
                 ],
                 alignment=ft.MainAxisAlignment.CENTER, # 中央揃え
             ),
+            # インポート・エクスポート部分
+            ft.Row(
+                [
+                    self.io_status,  # 処理状況の表示
+                    ft.TextButton(
+                        text="インポート",
+                        icon=ft.icons.UPLOAD_FILE,
+                        on_click=lambda e: self.import_picker.pick_files(
+                            allowed_extensions=["jsonl", "csv"]
+                        ),
+                    ),
+                    ft.TextButton(
+                        text="エクスポート",
+                        icon=ft.icons.DOWNLOAD,
+                        on_click=lambda e: self.export_picker.save_file(
+                            file_name="todo.jsonl", allowed_extensions=["jsonl", "csv"]
+                        ),
+                    ),
+                ],
+                alignment=ft.MainAxisAlignment.END, # 右寄せ
+            ),
             # 新規タスク入力部分
             ft.Container(
                 content=ft.Row(
                     controls=[
+                        ft.IconButton(  # すべて完了/未完了の切り替えボタン
+                            icon=ft.icons.DONE_ALL,
+                            tooltip="すべて完了/未完了に切り替え",
+                            on_click=self.toggle_all_clicked
+                        ),
                         self.new_task, # 新規タスク入力フィールド
                         ft.FloatingActionButton(  # 追加ボタン
                             icon=ft.icons.ADD, # アイコン
@@ -201,6 +527,7 @@ class TodoApp(ft.Column):
                 content=ft.Column(
                     spacing=25,
                     controls=[
+                        self.search,  # 検索ボックス
                         self.filter,  # フィルタータブ
                         self.tasks,   # タスクリスト
                         ft.Row(       # フッター部分
@@ -220,54 +547,219 @@ class TodoApp(ft.Column):
             ),
         ]
 
+    def _create_task(self, record):
+        """TaskRecordから表示用のTaskコントロールを作成"""
+        return Task(
+            record, # タスクのデータ
+            self.task_status_change,    # タスクの状態変更時の処理
+            self.task_delete, # タスクの削除時の処理
+            self.task_rename # タスク名の変更時の処理
+        )
+
+    def add_records(self, records):
+        """タスクのデータをまとめて追加（UI更新は呼び出し側で行う）"""
+        with self.lock:
+            records = list(records)
+            for record in records:
+                self.records[record.id] = record  # タスクのデータを追加
+                self.search_index.add(record.id, record.name)  # 検索用インデックスに登録
+                # 状態に応じたインデックスに登録
+                if record.completed:
+                    self.completed_tasks.add(record)
+                else:
+                    self.active_tasks.add(record)
+            self._refresh_search()  # 検索中なら追加したタスクも検索対象にする
+            self.tasks.extend(records)  # タスクリストに追加
+            self._update_items_left()  # 残タスク数を更新
+
     def add_clicked(self, e):
         """新規タスク追加時の処理"""
         if self.new_task.value:  # 入力値が存在する場合
             # 新しいタスクを作成
-            task = Task(
-                self.new_task.value, # タスク名
-                self.task_status_change,    # タスクの状態変更時の処理
-                self.task_delete # タスクの削除時の処理
-            )
-            self.tasks.controls.append(task)  # タスクリストに追加
+            record = TaskRecord(self.new_task.value)
+            self.add_records([record])
+            if self.storage:
+                self.storage.save(record)  # 保存（書き込みはバックグラウンドで行われる）
             self.new_task.value = ""  # 入力フィールドをクリア
             self.new_task.focus()  # 入力フィールドにフォーカス
-            self.update()  # UI更新
+            request_update(self)  # UI更新
+
+    def get_task(self, task_id):
+        """IDからタスクのデータを取得（存在しない場合はNone）"""
+        return self.records.get(task_id)
 
     def task_status_change(self, task):
         """タスクの状態が変更された時の処理"""
-        self.update()  # UI更新
+        self._completed_changed(task.record)
+        request_update(self)  # UI更新
+
+    def set_task_completed(self, task_id, completed):
+        """IDを指定してタスクの完了状態を変更（UI更新は呼び出し側で行う）"""
+        with self.lock:
+            record = self.records[task_id]
+            if record.completed != completed:
+                record.set_completed(completed)
+                self.tasks.refresh(record)  # チェックボックスに反映
+                self._completed_changed(record)
+
+    def _completed_changed(self, record):
+        """完了状態が変わったタスクのインデックスと表示を更新"""
+        with self.lock:
+            # 変更されたタスクだけをインデックス間で移動する
+            if record.completed:
+                self.active_tasks.discard(record)
+                self.completed_tasks.add(record)
+            else:
+                self.completed_tasks.discard(record)
+                self.active_tasks.add(record)
+            self.tasks.status_changed(record)  # 表示を更新
+            if self.storage:
+                self.storage.save(record)
+            self._update_items_left()  # 残タスク数を更新
 
     def task_delete(self, task):
         """タスクが削除された時の処理"""
-        self.tasks.controls.remove(task)  # タスクリストから削除
-        self.update()  # UI更新
+        self.remove_task(task.record.id)
+        request_update(self)  # UI更新
+
+    def task_rename(self, task):
+        """タスク名が変更された時の処理"""
+        with self.lock:
+            record = task.record
+            self.search_index.update(record.id, record.name)
+            if self.storage:
+                self.storage.save(record)
+            if self._refresh_search():
+                request_update(self)  # 検索結果から外れた場合は非表示にする
+
+    def rename_task(self, task_id, name):
+        """IDを指定してタスク名を変更（UI更新は呼び出し側で行う）"""
+        with self.lock:
+            record = self.records[task_id]
+            record.rename(name)
+            self.search_index.update(task_id, name)
+            self.tasks.refresh(record)  # 表示中のタスク名に反映
+            self._refresh_search()
+            if self.storage:
+                self.storage.save(record)
+
+    def remove_task(self, task_id):
+        """IDを指定してタスクのデータとその表示を削除（UI更新は呼び出し側で行う）"""
+        with self.lock:
+            record = self.records.pop(task_id)
+            self.search_index.remove(task_id)
+            if self.storage:
+                self.storage.delete(record.id)
+            self.tasks.remove(record)  # タスクリストから削除
+            self.active_tasks.discard(record)  # インデックスからも削除
+            self.completed_tasks.discard(record)
+            self._update_items_left()  # 残タスク数を更新
 
     def tabs_changed(self, e):
         """フィルタータブが変更された時の処理"""
-        self.update()  # UI更新
+        with self.lock:
+            status = self.filter.tabs[self.filter.selected_index].text  # 現在選択中のタブ
+            self.tasks.set_status(status, self.active_tasks, self.completed_tasks)
+            request_update(self)  # UI更新
+
+    def search_changed(self, e):
+        """検索ボックスの入力が変わった時の処理"""
+        with self.lock:
+            self.tasks.set_search(self.search_index.search(self.search.value or ""))
+            request_update(self)  # UI更新
+
+    def _refresh_search(self):
+        """検索中であれば、インデックスの変更を検索結果に反映（検索中ならTrueを返す）"""
+        matches = self.search_index.search(self.search.value or "")
+        if matches is None:
+            return False
+        self.tasks.set_search(matches)
+        return True
 
     def clear_clicked(self, e):
         """完了タスクの一括削除処理"""
-        for task in self.tasks.controls[:]:  # タスクリストのコピーでループ
-            if task.completed:  # 完了状態のタスクのみ
-                self.task_delete(task)  # 削除
-
-    def before_update(self):
-        """UI更新前の処理（タスクの表示制御とカウント更新）"""
-        status = self.filter.tabs[self.filter.selected_index].text  # 現在選択中のタブ
-        count = 0  # 未完了タスクのカウンター
-        # 各タスクの表示/非表示を設定
-        for task in self.tasks.controls:
-            task.visible = (
-                status == "すべて"  # すべてのタスクを表示
-                or (status == "実行中" and task.completed == False)  # 未完了タスクのみ表示
-                or (status == "完了" and task.completed)  # 完了タスクのみ表示
-            )
-            if not task.completed:
-                count += 1  # 未完了タスクをカウント
-        # 残タスク数の表示を更新
-        self.items_left.value = f"{count} 個の実行中の項目が残っています"
+        with self.lock:
+            removed = self.completed_tasks
+            if not removed:
+                return
+            for record in removed:
+                del self.records[record.id]  # IDで直接削除するので全体の走査は不要
+                self.search_index.remove(record.id)
+                if self.storage:
+                    self.storage.delete(record.id)
+            self.tasks.remove_many(removed)  # タスクリストからまとめて削除
+            self.completed_tasks = set()
+            self._update_items_left()  # 残タスク数を更新
+            request_update(self)  # UI更新は1回だけ
+
+    def toggle_all_clicked(self, e):
+        """すべて完了/未完了の切り替え（実行中のタスクがあればすべて完了にする）"""
+        self.set_all_completed(bool(self.active_tasks))
+        request_update(self)  # UI更新は1回だけ
+
+    def set_all_completed(self, completed):
+        """すべてのタスクの完了状態をまとめて変更（UI更新は呼び出し側で行う）"""
+        with self.lock:
+            if completed:
+                changed, self.active_tasks = self.active_tasks, set()
+                self.completed_tasks |= changed
+            else:
+                changed, self.completed_tasks = self.completed_tasks, set()
+                self.active_tasks |= changed
+            for record in changed:
+                record.set_completed(completed)
+                if self.storage:
+                    self.storage.save(record)
+            self.tasks.status_changed_many(changed)  # 表示をまとめて更新
+            self._update_items_left()  # 残タスク数を更新
+
+    def import_result(self, e):
+        """インポートするファイルが選択された時の処理"""
+        if e.files:
+            self.page.run_thread(self.import_tasks, e.files[0].path)
+
+    def export_result(self, e):
+        """エクスポート先が選択された時の処理"""
+        if e.path:
+            self.page.run_thread(self.export_tasks, e.path)
+
+    def import_tasks(self, path):
+        """
+        ファイル（JSON Lines / CSV）からタスクを読み込んで追加
+        ファイルは1行ずつ読み、IMPORT_CHUNK_SIZE件ごとに追加してUIを更新する
+        大量のタスクを取り込む場合は仮想化リスト（VIRTUALIZED）と組み合わせて使う
+        """
+        count = 0
+        try:
+            for records in chunked(read_tasks(path), self.IMPORT_CHUNK_SIZE):
+                self.add_records(records)
+                if self.storage:
+                    for record in records:
+                        self.storage.save(record)
+                count += len(records)
+                self.io_status.value = f"インポート中... {count} 件"
+                request_update(self)  # UI更新はチャンクごとに1回だけ
+        except (OSError, ValueError, csv.Error) as ex:  # 読み書きできない・文字コードや形式が違う
+            self.io_status.value = f"⚠️ インポートエラー（{count} 件まで追加済み）: {ex}"
+        else:
+            self.io_status.value = f"{count} 件をインポートしました"
+        request_update(self)
+
+    def export_tasks(self, path):
+        """タスクをファイル（JSON Lines / CSV）に1件ずつ書き出す"""
+        try:
+            with self.lock:
+                records = list(self.records.values())  # 書き出している間に追加・削除されても影響しない
+            count = write_tasks(path, records)
+        except (OSError, ValueError, csv.Error) as ex:
+            self.io_status.value = f"⚠️ エクスポートエラー: {ex}"
+        else:
+            self.io_status.value = f"{count} 件をエクスポートしました"
+        request_update(self)
+
+    def _update_items_left(self):
+        """残タスク数の表示を更新"""
+        self.items_left.value = f"{len(self.active_tasks)} 個の実行中の項目が残っています"
 
 
 def main(page: ft.Page):
@@ -279,6 +771,11 @@ def main(page: ft.Page):
     page.horizontal_alignment = ft.CrossAxisAlignment.CENTER  # 水平方向の中央揃え
     page.scroll = ft.ScrollMode.ADAPTIVE  # スクロールモードを適応的に設定
 
+    # UI更新のスケジューラーを登録（更新要求をUPDATE_INTERVALごとにまとめて送る）
+    scheduler = UpdateScheduler.install(page, UPDATE_INTERVAL)
+    # 終了時に要求された更新回数と実際に送った回数をログに記録（確認するにはDEBUGレベルのログを有効にする）
+    page.on_disconnect = lambda e: logger.debug("UI更新: %s", scheduler.stats())
+
     # テーマカラーの設定
     page.theme = ft.Theme(
         color_scheme_seed="blue",  # ベースカラーの設定
@@ -305,7 +802,8 @@ def main(page: ft.Page):
     )
 
     # ToDoアプリのインスタンスを作成してページに追加
-    page.add(TodoApp())
+    page.add(TodoApp(virtualized=VIRTUALIZED, storage=TaskStorage(DB_PATH)))
 
 # アプリケーションの実行
-ft.app(main)
\ No newline at end of file
+if __name__ == "__main__":
+    ft.app(main)
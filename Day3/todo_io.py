@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+
+from todo_model import TaskRecord
+
+FIELDS = ["name", "completed", "created_at", "updated_at"]  # 入出力する項目
+
+
+def _file_format(path):
+    """拡張子からファイル形式を判定"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"対応していないファイル形式です: {ext}（.jsonl または .csv）")
+
+
+def _to_bool(value):
+    """CSVの文字列やJSONの値を完了状態に変換"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "済", "完了")
+    return bool(value)
+
+
+def _to_timestamp(value):
+    """日時の値をUNIX時間に変換（数値か数値の文字列でなければValueError）"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"日時が数値ではありません: {value!r}")
+    return float(value)
+
+
+def _to_record(row):
+    """
+    1行分のデータからTaskRecordを作成（IDは取り込み時に新しく振る）
+    タスク名が空の行はNone、形式が正しくない行はValueError
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"タスクがオブジェクトではありません: {row!r}")
+    name = row.get("name") or ""
+    if not isinstance(name, str):
+        raise ValueError(f"タスク名が文字列ではありません: {name!r}")
+    name = name.strip()
+    if not name:
+        return None
+    record = TaskRecord(name, _to_bool(row.get("completed", False)))
+    if row.get("created_at"):
+        record.created_at = _to_timestamp(row["created_at"])
+    if row.get("updated_at"):
+        record.updated_at = _to_timestamp(row["updated_at"])
+    return record
+
+
+def read_tasks(path):
+    """
+    ファイルからタスクを1件ずつ読み込む（ファイル全体を一度に読み込まない）
+    形式が正しくない行があれば、その行番号を付けたValueErrorを送出する
+    """
+    file_format = _file_format(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "jsonl":
+            rows = ((number, line) for number, line in enumerate(f, 1) if line.strip())
+        else:
+            reader = csv.DictReader(f)
+            rows = ((reader.line_num, row) for row in reader)
+        for number, row in rows:
+            try:
+                record = _to_record(json.loads(row) if file_format == "jsonl" else row)
+            except ValueError as e:
+                raise ValueError(f"{number}行目: {e}") from None
+            if record is not None:
+                yield record
+
+
+def chunked(iterable, size):
+    """イテラブルをsize件ずつのリストに分けて返す"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_tasks(path, records):
+    """タスクを1件ずつファイルに書き出し、書き出した件数を返す"""
+    file_format = _file_format(path)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+        for record in records:
+            if file_format == "jsonl":
+                f.write(json.dumps({
+                    "name": record.name,
+                    "completed": record.completed,
+                    "created_at": record.created_at,
+                    "updated_at": record.updated_at,
+                }, ensure_ascii=False))
+                f.write("\n")
+            else:
+                writer.writerow([
+                    record.name, int(record.completed), record.created_at, record.updated_at,
+                ])
+            count += 1
+    return count
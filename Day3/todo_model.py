@@ -0,0 +1,43 @@
+import itertools
+import time
+from dataclasses import dataclass, field
+
+_task_ids = itertools.count(1)  # タスクIDの採番用カウンター
+
+
+@dataclass(slots=True, eq=False)
+class TaskRecord:
+    """
+    1件のタスクを表すデータ
+    画面のコントロールとは切り離して保持し、必要になった時だけTaskコントロールを作る
+    """
+    name: str  # タスク名
+    completed: bool = False  # 完了状態
+    id: int = field(default_factory=lambda: next(_task_ids))  # タスクID
+    created_at: float = field(default_factory=time.time)  # 作成日時（UNIX時間）
+    updated_at: float = field(default_factory=time.time)  # 更新日時（UNIX時間）
+
+    def rename(self, name):
+        """タスク名を変更"""
+        self.name = name
+        self.updated_at = time.time()
+
+    def set_completed(self, completed):
+        """完了状態を変更"""
+        self.completed = completed
+        self.updated_at = time.time()
+
+
+def advance_task_ids(last_id):
+    """採番済みのIDより後ろからタスクIDを振るようにする"""
+    global _task_ids
+    _task_ids = itertools.count(max(last_id + 1, next(_task_ids)))
+
+
+def is_visible(completed, status):
+    """指定したフィルターでタスクを表示するかどうかを判定"""
+    return (
+        status == "すべて"  # すべてのタスクを表示
+        or (status == "実行中" and not completed)  # 未完了タスクのみ表示
+        or (status == "完了" and completed)  # 完了タスクのみ表示
+    )
@@ -0,0 +1,122 @@
+import unicodedata
+from collections import defaultdict
+
+
+def normalize(text):
+    """全角・半角や大文字・小文字の違いをなくした検索用の文字列に変換"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+PAD = "\0"  # 3-gramを名前の末尾まで作るための埋め草（タスク名には含まれない文字）
+
+
+def trigrams(text):
+    """
+    文字列の各位置から始まる3-gramと、その出現位置の組の集合
+    末尾の2文字もPADで埋めて3-gramにするので、どの文字もいずれかの3-gramの先頭になる
+    """
+    padded = text + PAD * 2
+    return {(padded[i:i + 3], i) for i in range(len(text))}
+
+
+def trigram_cover(query):
+    """
+    クエリのすべての文字を覆う3-gramと、クエリ内での位置の組のリスト
+    （3文字ずつずらし、最後は末尾の3文字。位置を固定して全部一致すればクエリと一致する）
+    """
+    offsets = sorted({*range(0, len(query) - 2, 3), len(query) - 3})
+    return [(query[i:i + 3], i) for i in offsets]
+
+
+class SearchIndex:
+    """
+    タスク名の出現位置付きの3-gramからタスクIDを引く転置インデックス
+    3文字以上のクエリは、クエリの先頭が同じ位置にあるタスクの集合の積集合をとるだけで完全に一致するので、
+    候補ごとの部分一致の確認がいらない
+    1〜2文字のクエリは、そのクエリで始まる3-gramの転置リストの和集合で検索する
+    （1-gram・2-gramの転置リストを別に持たないので、タスク1件あたりの登録数は名前の文字数で済む）
+    タスクの追加・名前の変更・削除のたびに、そのタスクの分だけを更新する
+    """
+    def __init__(self):
+        self.positional = defaultdict(set)  # (3-gram, 出現位置) → その位置に3-gramがあるタスクIDの集合
+        self.positions = defaultdict(set)  # 3-gram → そのgramが出現する位置の集合
+        self.prefixes = defaultdict(set)  # 3-gramの先頭の1文字・2文字 → その文字で始まる3-gramの集合
+        self.names = {}  # タスクID → 正規化済みのタスク名
+
+    def add(self, task_id, name):
+        """タスクをインデックスに追加"""
+        name = normalize(name)
+        self.names[task_id] = name
+        for key in trigrams(name):
+            self.positional[key].add(task_id)
+            gram, position = key
+            if gram not in self.positions:
+                self.prefixes[gram[:1]].add(gram)
+                self.prefixes[gram[:2]].add(gram)
+            self.positions[gram].add(position)
+
+    def remove(self, task_id):
+        """タスクをインデックスから削除"""
+        name = self.names.pop(task_id, None)
+        if name is None:
+            return
+        for key in trigrams(name):
+            ids = self.positional[key]
+            ids.discard(task_id)
+            if ids:
+                continue
+            del self.positional[key]
+            gram, position = key
+            self.positions[gram].discard(position)
+            if self.positions[gram]:
+                continue
+            del self.positions[gram]
+            for prefix in (gram[:1], gram[:2]):
+                self.prefixes[prefix].discard(gram)
+                if not self.prefixes[prefix]:
+                    del self.prefixes[prefix]
+
+    def update(self, task_id, name):
+        """タスク名の変更をインデックスに反映"""
+        self.remove(task_id)
+        self.add(task_id, name)
+
+    def search(self, query):
+        """
+        クエリを含むタスクIDの集合を返す
+        クエリが空の場合は絞り込みなしを表すNoneを返す
+        """
+        query = normalize(query.strip())
+        if not query:
+            return None
+        if len(query) < 3:
+            return self._search_prefix(query)
+        return self._search_positional(query)
+
+    def _search_prefix(self, query):
+        """1〜2文字のクエリを、クエリで始まる3-gramの転置リストの和集合で検索"""
+        return set().union(*(
+            self.positional[(gram, position)]
+            for gram in self.prefixes.get(query, ())
+            for position in self.positions[gram]
+        ))
+
+    def _search_positional(self, query):
+        """3文字以上のクエリを、位置付きの3-gramの転置リストの積集合だけで検索"""
+        cover = trigram_cover(query)
+        # クエリが始まりうる位置（覆う3-gramがすべて、そこからの相対位置に出現する位置）
+        starts = None
+        for gram, offset in cover:
+            shifted = {position - offset for position in self.positions.get(gram, ())}
+            starts = shifted if starts is None else starts & shifted
+            if not starts:
+                return set()
+        empty = set()
+        results = []
+        for start in starts:
+            # 開始位置ごとに転置リストを小さい順に積集合をとる（すべてC実装の集合演算で済む）
+            postings = sorted((self.positional.get((gram, start + offset), empty) for gram, offset in cover), key=len)
+            results.append(postings[0].intersection(*postings[1:]))
+        if len(results) == 1:
+            return results[0]  # 多くの場合、クエリの始まる位置は1つなので和集合を作らない
+        return set().union(*results)
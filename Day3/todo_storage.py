@@ -0,0 +1,151 @@
+import atexit
+import itertools
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from todo_model import TaskRecord, advance_task_ids
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStorage:
+    """
+    SQLiteを使ったタスクの保存先
+    UIからの変更はキューに積むだけにして、バックグラウンドのスレッドがまとめて書き込む（write-behind）
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+    # 変更の種類ごとのSQL
+    STATEMENTS = {
+        "save": """
+            INSERT INTO tasks (id, name, completed, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name,
+                completed = excluded.completed,
+                updated_at = excluded.updated_at
+        """,
+        "delete": "DELETE FROM tasks WHERE id = ?",
+    }
+
+    def __init__(self, path, batch_size=500, flush_interval=0.2):
+        self.path = path  # データベースファイルのパス
+        self.batch_size = batch_size  # 1回のトランザクションでまとめる最大件数
+        self.flush_interval = flush_interval  # 変更を待ってまとめる時間（秒）
+        self.queue = queue.Queue()  # 書き込み待ちの変更
+
+        # テーブルの作成とWALモードの設定（WALなら書き込み中でも読み込みがブロックされない）
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(self.SCHEMA)
+        conn.close()
+        # 保存済みのタスクとIDが重複しないように採番を進める
+        # これより大きいIDはこのプロセスで追加したタスクなので、loadでは読み込まない
+        self.stored_last_id = self.last_id()
+        advance_task_ids(self.stored_last_id)
+
+        # 書き込み用のスレッドを開始し、終了時には残りを書き込んでから閉じる
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        """データベースに接続"""
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save(self, record):
+        """タスクの追加・更新をキューに積む"""
+        self.queue.put((
+            "save",
+            (record.id, record.name, int(record.completed), record.created_at, record.updated_at),
+        ))
+
+    def delete(self, task_id):
+        """タスクの削除をキューに積む"""
+        self.queue.put(("delete", (task_id,)))
+
+    def flush(self):
+        """キューに積まれた変更がすべて書き込まれるまで待つ"""
+        self.queue.join()
+
+    def close(self):
+        """残りの変更を書き込んでから書き込み用のスレッドを終了"""
+        if self.writer.is_alive():
+            self.queue.put(None)  # 終了の合図
+            self.writer.join()
+
+    def _write_loop(self):
+        """キューから変更を取り出し、まとめて書き込む（書き込み用スレッドで実行）"""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self.queue.get()]  # 最初の1件が来るまで待つ
+            # flush_intervalの間に届いた変更をまとめて取り出す
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    timeout = max(0, deadline - time.monotonic())
+                    batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if None in batch:
+                running = False
+            changes = [change for change in batch if change is not None]
+            try:
+                # 同じ種類の変更が続く部分はexecutemanyでまとめて実行する（順序は保つ）
+                with conn:
+                    for op, group in itertools.groupby(changes, key=lambda change: change[0]):
+                        conn.executemany(self.STATEMENTS[op], [params for _, params in group])
+            except sqlite3.Error:
+                # 書き込めなかった変更は記録して捨て、以降の変更の書き込みとflushの待機を止めない
+                logger.exception("タスクの変更を%d件保存できませんでした", len(changes))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+        conn.close()
+
+    def last_id(self):
+        """保存済みのタスクIDの最大値"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+        finally:
+            conn.close()
+
+    def load(self, page_size=500):
+        """
+        保存済みのタスクをページ単位で読み込む（テーブル全体を一度に読み込まない）
+        読み込むのは起動時に保存済みだったタスクだけで、読み込み中に追加・インポートしたタスクは含まない
+        """
+        conn = self._connect()
+        try:
+            last_id = 0
+            while True:
+                # IDをキーにしたページングでOFFSETによる読み飛ばしを避ける
+                rows = conn.execute(
+                    "SELECT id, name, completed, created_at, updated_at FROM tasks"
+                    " WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                    (last_id, self.stored_last_id, page_size),
+                ).fetchall()
+                if not rows:
+                    break
+                yield [
+                    TaskRecord(name, bool(completed), task_id, created_at, updated_at)
+                    for task_id, name, completed, created_at, updated_at in rows
+                ]
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
@@ -0,0 +1,82 @@
+import threading
+import weakref
+
+_schedulers = weakref.WeakKeyDictionary()  # ページ → UpdateScheduler
+
+
+class UpdateScheduler:
+    """
+    コントロールの更新要求をまとめ、一定間隔ごとに1回だけpage.updateを送るスケジューラー
+    同じ間隔内の重複した要求や、更新する親に含まれる子コントロールの要求は1つにまとめる
+    """
+    def __init__(self, page, interval=1 / 60):
+        self.page = page  # 更新を送るページ
+        self.interval = interval  # 更新をまとめる間隔（秒）
+        self.dirty = {}  # 更新が必要なコントロール（順序付きの集合として使う）
+        self.lock = threading.Lock()
+        self.timer = None  # 次の送信を予約しているタイマー
+        # 統計情報
+        self.requested = 0  # 更新を要求された回数
+        self.flushes = 0  # page.updateを送った回数
+        self.sent = 0  # page.updateで送ったコントロールの数
+
+    @classmethod
+    def install(cls, page, interval=1 / 60):
+        """ページにスケジューラーを登録（以降のrequest_updateはこのスケジューラーを使う）"""
+        scheduler = cls(page, interval)
+        _schedulers[page] = scheduler
+        return scheduler
+
+    def request(self, control):
+        """コントロールを更新が必要な状態にし、次の送信を予約"""
+        with self.lock:
+            self.requested += 1
+            self.dirty[control] = None
+            if self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """溜まっている更新要求をまとめて送信"""
+        with self.lock:
+            dirty = self.dirty
+            self.dirty = {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not dirty:
+            return
+        controls = [control for control in dirty if not self._has_dirty_ancestor(control, dirty)]
+        self.flushes += 1
+        self.sent += len(controls)
+        self.page.update(*controls)
+
+    def _has_dirty_ancestor(self, control, dirty):
+        """親をたどり、同時に更新されるコントロールが含まれていればTrue"""
+        parent = control.parent
+        while parent is not None:
+            if parent in dirty:
+                return True
+            parent = parent.parent
+        return False
+
+    def stats(self):
+        """要求された回数と実際に送った回数"""
+        return {
+            "requested": self.requested,
+            "flushes": self.flushes,
+            "sent_controls": self.sent,
+        }
+
+
+def request_update(control):
+    """
+    コントロールの更新を要求
+    ページにスケジューラーが登録されていればまとめて送り、なければすぐに更新する
+    """
+    scheduler = _schedulers.get(control.page) if control.page else None
+    if scheduler is None:
+        control.update()
+    else:
+        scheduler.request(control)
@@ -0,0 +1,235 @@
+"""
+ライセンスキーのベンチマーク
+- キーの発行（generate_license_components / generate_license_key）を1件ずつ・まとめて計測する
+- 有効・期限切れ・形式不正のキーの検証（verify_license_key）を1件ずつ・まとめて計測する
+- 検証結果のキャッシュが空の場合（cold）と溜まっている場合（warm）を比較する
+- 旧形式（base64のISO日時:ハッシュ）と新形式（バイナリのbase64url）で、キーの生成と分解の速度を比較する
+- 署名の作成・確認にかかる時間を計測する
+- 100万件の失効リストについて、メモリ使用量と失効しているかの判定にかかる時間を計測する
+- 失効させたキーの「-」「_」を「+」「/」に変えても、失効扱いのままになることを確認する
+
+すべてtimeitで計測するので、ネットワークや追加のパッケージがなくても実行できます。
+本番の秘密鍵と失効リストは使わず、使い捨ての秘密鍵と一時ディレクトリの失効リストで計測します
+（アプリのディレクトリにファイルを作らず、結果が本番の失効リストの件数に左右されない）。
+--jsonを指定すると結果をJSONで保存するので、バージョン間で比較して性能の低下を見つけられます。
+
+実行方法: python bench_license.py [--json results.json] [--skip-revocation]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import secrets
+import subprocess
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta
+
+from license_batch import issue_chunk
+from license_format import decode_license_key, encode_license_key
+from license_manager import generate_legacy_license_key, generate_license_components, generate_license_key
+from license_revocation import REVOCATION_DIR_ENV, RevocationList, get_revocation_list
+from license_service import LicenseVerifier
+from license_signing import SECRET_ENV, LicenseSigner
+from license_system import verify_license_key, verify_license_keys
+
+KEYS = 10_000  # 計測に使うキーの数
+REPEAT = 5  # 計測を繰り返す回数（最も速い回を採用）
+REVOKED = 1_000_000  # 失効リストの件数
+LOOKUPS = 100_000  # 失効しているかを判定する回数
+
+results = []  # 計測結果（JSONに保存する）
+
+def record(name: str, seconds: float, count: int, **extra) -> dict:
+    """1件あたりの時間と1秒あたりの件数を記録して表示"""
+    result = {
+        "name": name,
+        "count": count,
+        "us_per_op": seconds / count * 1e6,
+        "ops_per_sec": count / seconds,
+        **extra,
+    }
+    results.append(result)
+    print(f"  {name:<40} {result['us_per_op']:>9.2f}µs {result['ops_per_sec']:>12,.0f}件/秒")
+    return result
+
+def best_time(func, setup=None) -> float:
+    """funcを1回実行する時間をREPEAT回計測し、最も速い時間を返す（setupは計測の外で毎回実行）"""
+    timer = timeit.Timer(func)
+    times = []
+    for _ in range(REPEAT):
+        if setup:
+            setup()
+        times.append(timer.timeit(number=1))
+    return min(times)
+
+def measure(name: str, func, items, **extra) -> dict:
+    """itemsの各要素についてfuncを1件ずつ呼ぶ時間を記録"""
+    seconds = best_time(lambda: [func(*item) for item in items])
+    return record(name, seconds, len(items), **extra)
+
+def sample_keys(expiry_offset: timedelta) -> list[tuple[str, str]]:
+    """計測用の(メールアドレス, ライセンスキー)の組"""
+    expiry = datetime.now() + expiry_offset
+    return [(f"user{i}@example.com", generate_license_key(f"user{i}@example.com", expiry, "standard"))
+            for i in range(KEYS)]
+
+def bench_issue():
+    """キーの発行を計測"""
+    print("発行")
+    now = datetime.now()
+    requests = [(f"user{i}@example.com", now + timedelta(days=i % 400)) for i in range(KEYS)]
+    measure("generate_license_components", generate_license_components, requests)
+    measure("generate_license_key", generate_license_key, requests)
+    rows = [{"email": email, "license_type": "standard", "start_date": ""} for email, _ in requests]
+    record("issue_chunk (batch)", best_time(lambda: issue_chunk(rows)), len(rows))
+
+def bench_verify():
+    """有効・期限切れ・形式不正のキーの検証を計測"""
+    print("検証")
+    valid = sample_keys(timedelta(days=365))
+    expired = sample_keys(timedelta(days=-30))
+    malformed = [(email, key[:-4] + "!!!!") for email, key in valid]
+    for name, pairs in [("valid", valid), ("expired", expired), ("malformed", malformed)]:
+        measure(f"verify_license_key ({name})", verify_license_key, pairs)
+    mixed = valid[::3] + expired[::3] + malformed[::3]
+    record("verify_license_keys (batch, mixed)", best_time(lambda: verify_license_keys(mixed)), len(mixed))
+
+def bench_cache():
+    """検証結果のキャッシュが空の場合と溜まっている場合を比較"""
+    print("キャッシュ")
+    pairs = sample_keys(timedelta(days=365))
+    verifier = LicenseVerifier(maxsize=KEYS)
+    record("LicenseVerifier (cold)", best_time(lambda: verifier.verify_many(pairs), setup=verifier.clear), len(pairs))
+    verifier.verify_many(pairs)
+    seconds = best_time(lambda: verifier.verify_many(pairs))
+    record("LicenseVerifier (warm)", seconds, len(pairs), hit_rate=verifier.stats()["hit_rate"])
+
+def bench_format():
+    """キーの形式ごとに生成・分解の速度と文字数を比較"""
+    print("キーの形式")
+    now = datetime.now()
+    requests = [(f"user{i}@example.com", now + timedelta(days=i % 400)) for i in range(KEYS)]
+    formats = {
+        "v1": lambda email, expiry: generate_legacy_license_key(email, expiry),
+        "v2 (unsigned)": lambda email, expiry: encode_license_key(
+            hashlib.sha256(email.encode()).digest(), expiry, "standard"
+        ),
+        "v3 (signed)": lambda email, expiry: generate_license_key(email, expiry, "standard"),
+    }
+    for name, generate in formats.items():
+        keys = [(generate(*request),) for request in requests]
+        length = len(keys[0][0])
+        measure(f"encode {name}", generate, requests, key_length=length)
+        measure(f"decode {name}", decode_license_key, keys, key_length=length)
+
+def bench_signature():
+    """署名の作成・確認にかかる時間を計測"""
+    print("署名")
+    signer = LicenseSigner(secrets.token_bytes(32))
+    payload = b"\x03" * 14
+    signature = signer.sign(payload)
+    number = 100_000
+    seconds = min(timeit.repeat(lambda: signer.sign(payload), number=number, repeat=REPEAT))
+    record("LicenseSigner.sign", seconds, number)
+    seconds = min(timeit.repeat(lambda: signer.verify(payload, signature), number=number, repeat=REPEAT))
+    record("LicenseSigner.verify", seconds, number)
+
+def bench_revocation():
+    """100万件の失効リストでのメモリ使用量と判定時間を計測"""
+    print(f"失効リスト（{REVOKED:,}件）")
+    with tempfile.TemporaryDirectory() as tmp:
+        revocations = RevocationList(os.path.join(tmp, "revocations.db"), os.path.join(tmp, "revocations.bloom"))
+        revoked = [secrets.token_urlsafe(24) for _ in range(REVOKED)]
+        started = time.perf_counter()
+        revocations.revoke_many(revoked)
+        record("RevocationList.revoke_many", time.perf_counter() - started, REVOKED)
+        db_bytes = sum(
+            os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp) if name.startswith("revocations.db")
+        )
+        filter_bytes = len(revocations.bloom.bits)
+        print(f"  フィルター {filter_bytes / 2**20:.2f}MB（ハッシュ関数{revocations.bloom.hashes}個）"
+              f" / データベース {db_bytes / 2**20:.1f}MB")
+
+        def db_only(license_key):
+            return revocations.conn.execute(
+                "SELECT 1 FROM revoked WHERE license_key = ?", (license_key,)
+            ).fetchone() is not None
+
+        unknown = [(secrets.token_urlsafe(24),) for _ in range(LOOKUPS)]
+        hits = [(key,) for key in revoked[:LOOKUPS]]
+        false_positive_rate = sum(key.encode() in revocations.bloom for key, in unknown) / LOOKUPS
+        measure("is_revoked (not revoked)", revocations.is_revoked, unknown,
+                filter_bytes=filter_bytes, db_bytes=db_bytes, false_positive_rate=false_positive_rate)
+        measure("database only (not revoked)", db_only, unknown)
+        measure("is_revoked (revoked)", revocations.is_revoked, hits)
+        measure("database only (revoked)", db_only, hits)
+        revocations.close()
+
+def check_revocation_aliases():
+    """表記だけを変えた失効済みのキー（base64の「-」→「+」、「_」→「/」）も失効扱いになるかを確認"""
+    print("失効リスト（表記の違うキー）")
+    signer = LicenseSigner(secrets.token_bytes(32))  # 本番の秘密鍵は使わない
+    expiry = datetime.now() + timedelta(days=365)
+    keys = (encode_license_key(hashlib.sha256(f"user{i}@example.com".encode()).digest(), expiry, "standard", signer.sign)
+            for i in range(KEYS))
+    license_key = next(key for key in keys if "-" in key or "_" in key)
+    alias = license_key.replace("-", "+").replace("_", "/")
+    with tempfile.TemporaryDirectory() as tmp:
+        revocations = RevocationList(os.path.join(tmp, "revocations.db"), os.path.join(tmp, "revocations.bloom"))
+        revocations.revoke(license_key)
+        if not revocations.is_revoked(alias):
+            raise RuntimeError(f"表記を変えたキーが失効扱いになりません: {alias}")
+        if revocations.revoke(alias):
+            raise RuntimeError(f"表記を変えたキーを別のキーとして失効させました: {alias}")
+        revocations.close()
+    print(f"  {license_key} → {alias}: 失効扱い")
+
+def git_revision() -> str | None:
+    """計測したコードのコミット（gitがなければNone）"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="ライセンスキーのベンチマーク")
+    parser.add_argument("--json", help="結果を保存するJSONファイルのパス")
+    parser.add_argument("--skip-revocation", action="store_true", help="時間のかかる失効リストの計測を省略")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 発行・検証の関数が使う秘密鍵と失効リストを、使い捨てのものに差し替える
+        os.environ[SECRET_ENV] = secrets.token_hex(32)
+        os.environ[REVOCATION_DIR_ENV] = tmp
+        bench_issue()
+        bench_verify()
+        bench_cache()
+        bench_format()
+        bench_signature()
+        check_revocation_aliases()
+        if not args.skip_revocation:
+            bench_revocation()
+        get_revocation_list().close()  # 一時ディレクトリを消せるようにデータベースを閉じる
+
+    if args.json:
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "keys": KEYS,
+            "repeat": REPEAT,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+ライセンスキーの一括発行
+
+顧客リスト（CSV または JSON Lines、項目は email, license_type, start_date）を読み込み、
+プロセスプールでチャンクごとにライセンスキーを生成して、結果を1行ずつ出力ファイルに書き出します。
+
+使い方:
+    python license_batch.py customers.csv licenses.csv --workers 4 --chunk-size 1000
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+
+from license_manager import calculate_expiry_date, generate_license_key
+from license_registry import REGISTRY_PATH, IssuedLicense, LicenseRegistry
+from license_signing import load_secret
+
+LICENSE_TYPES = ("trial", "standard", "professional")
+INPUT_FIELDS = ["email", "license_type", "start_date"]
+OUTPUT_FIELDS = ["email", "license_type", "start_date", "expiry_date", "license_key", "error"]
+
+@dataclass
+class BatchResult:
+    """一括発行の結果"""
+    issued: int  # 発行できた件数
+    errors: int  # エラーになった件数
+    seconds: float  # 処理にかかった時間（秒）
+
+    @property
+    def keys_per_sec(self) -> float:
+        """1秒あたりの発行件数"""
+        return self.issued / self.seconds if self.seconds else 0.0
+
+def _file_format(path: str) -> str:
+    """拡張子からファイル形式を判定"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"対応していないファイル形式です: {ext}（.jsonl または .csv）")
+
+def _parse_json_row(line: str) -> dict:
+    """JSON Linesの1行を読み込む（JSONでない・オブジェクトでない行は理由をerrorに入れた行にする）"""
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return {"error": f"JSONの形式が不正です: {e}"}
+    if not isinstance(row, dict):
+        return {"error": f"行がオブジェクトではありません: {line.strip()[:50]}"}
+    return row
+
+def _to_request(row: dict) -> dict:
+    """1行分のデータを入力の項目だけの辞書にする（文字列でない項目があればerrorに理由を入れる）"""
+    request = {"error": row.get("error") or ""}
+    for field in INPUT_FIELDS:
+        value = row.get(field)
+        if value is None:
+            value = ""
+        elif not isinstance(value, str):
+            request["error"] = request["error"] or f"{field} が文字列ではありません: {value!r}"
+            value = str(value)
+        request[field] = value.strip()
+    return request
+
+def read_requests(path: str) -> Iterator[dict]:
+    """
+    顧客リストを1行ずつ読み込む（ファイル全体を一度に読み込まない）
+    形式が不正な行も一括発行を止めないように、errorに理由を入れた行として返す
+    """
+    file_format = _file_format(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "jsonl":
+            rows = (_parse_json_row(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            yield _to_request(row)
+
+def count_requests(path: str) -> int:
+    """顧客リストの件数を数える（進捗表示用）"""
+    return sum(1 for _ in read_requests(path))
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """イテラブルをsize件ずつのリストに分けて返す"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def issue_license(row: dict) -> dict:
+    """1件分のライセンスキーを発行（入力が不正な場合はerrorに理由を入れて返す）"""
+    result = dict.fromkeys(OUTPUT_FIELDS, "")
+    result.update(row)
+    if row.get("error"):
+        return result  # 読み込みの時点で不正と分かっている行
+    try:
+        if not row["email"]:
+            raise ValueError("メールアドレスがありません")
+        if row["license_type"] not in LICENSE_TYPES:
+            raise ValueError(f"ライセンスタイプが不正です: {row['license_type']}")
+        try:
+            start = datetime.strptime(row["start_date"], "%Y-%m-%d") if row["start_date"] else datetime.now()
+        except ValueError:
+            raise ValueError("開始日の形式が正しくありません（YYYY-MM-DD）")
+
+        expiry = calculate_expiry_date(start, row["license_type"])
+        result["start_date"] = start.strftime("%Y-%m-%d")
+        result["expiry_date"] = expiry.strftime("%Y-%m-%d")
+        result["license_key"] = generate_license_key(row["email"], expiry, row["license_type"])
+    except (ValueError, OverflowError) as e:  # 入力の誤り・有効期限が日付の範囲を超える
+        result["error"] = str(e)
+    return result
+
+def issue_chunk(rows: list[dict]) -> list[dict]:
+    """チャンク単位でライセンスキーを発行（ワーカープロセスで実行）"""
+    return [issue_license(row) for row in rows]
+
+def issue_batch(
+    input_path: str,
+    output_path: str,
+    workers: int | None = None,
+    chunk_size: int = 1000,
+    progress: Callable[[int, int], None] | None = None,
+    registry: LicenseRegistry | None = None,
+) -> BatchResult:
+    """
+    顧客リストのライセンスキーを一括発行し、出力ファイルに書き出します。
+
+    Args:
+        input_path (str): 顧客リストのパス（.csv / .jsonl）
+        output_path (str): 結果の出力先のパス（.csv / .jsonl）
+        workers (int | None): ワーカープロセス数（Noneの場合はCPU数）
+        chunk_size (int): 1回でワーカーに渡す件数
+        progress (Callable | None): チャンクを書き出すたびに(発行件数, エラー件数)で呼ばれる関数
+        registry (LicenseRegistry | None): 発行したライセンスを記録する台帳
+
+    Returns:
+        BatchResult: 発行件数・エラー件数・処理時間
+    """
+    output_format = _file_format(output_path)
+    workers = workers or os.cpu_count() or 1
+    issued = errors = 0
+    started = time.perf_counter()
+    # 各ワーカーが同時に秘密鍵を作成しないよう、先に用意しておく
+    load_secret(create=True)
+
+    # UIのスレッドから呼ばれても安全なようにspawnでワーカーを起動する
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool, \
+            open(output_path, "w", encoding="utf-8", newline="") as f:
+        if output_format == "csv":
+            writer = csv.DictWriter(f, OUTPUT_FIELDS)
+            writer.writeheader()
+
+        # 実行中のチャンクをワーカー数の2倍までに抑え、入力を少しずつ読み込む
+        # （Executor.mapは入力を最初にすべて読み込んでしまう）
+        pending = deque()
+        chunks = chunked(read_requests(input_path), chunk_size)
+        for chunk in chunks:
+            pending.append(pool.submit(issue_chunk, chunk))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            results = pending.popleft().result()
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(pool.submit(issue_chunk, next_chunk))
+
+            for result in results:
+                if output_format == "jsonl":
+                    f.write(json.dumps(result, ensure_ascii=False))
+                    f.write("\n")
+                else:
+                    writer.writerow(result)
+                if result["error"]:
+                    errors += 1
+                else:
+                    issued += 1
+            if registry is not None:
+                # チャンク単位でまとめて台帳に記録する
+                registry.add_many(
+                    IssuedLicense(
+                        result["email"], result["license_type"], result["start_date"],
+                        result["expiry_date"], result["license_key"],
+                    )
+                    for result in results if not result["error"]
+                )
+            if progress:
+                progress(issued, errors)
+
+    return BatchResult(issued, errors, time.perf_counter() - started)
+
+def default_output_path(input_path: str) -> str:
+    """入力ファイルと同じ場所・形式の出力先のパス"""
+    stem, ext = os.path.splitext(input_path)
+    return f"{stem}_licenses{ext}"
+
+def main():
+    parser = argparse.ArgumentParser(description="ライセンスキーの一括発行")
+    parser.add_argument("input", help="顧客リスト（.csv / .jsonl）")
+    parser.add_argument("output", nargs="?", help="出力先（省略時は 入力ファイル名_licenses）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="1回でワーカーに渡す件数")
+    parser.add_argument("--registry", nargs="?", const=REGISTRY_PATH, default=None,
+                        help="発行したライセンスを記録する台帳（パス省略時は licenses.db）")
+    args = parser.parse_args()
+
+    output_path = args.output or default_output_path(args.input)
+    registry = LicenseRegistry(args.registry) if args.registry else None
+    result = issue_batch(args.input, output_path, args.workers, args.chunk_size, registry=registry)
+    print(f"発行: {result.issued}件 / エラー: {result.errors}件 / "
+          f"{result.seconds:.2f}秒 ({result.keys_per_sec:,.0f} keys/sec)")
+    print(f"出力先: {output_path}")
+
+if __name__ == "__main__":
+    main()
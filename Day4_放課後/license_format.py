@@ -0,0 +1,104 @@
+"""
+ライセンスキーの形式
+
+バージョン1（旧形式）: [有効期限のISO形式をbase64]:[メールアドレスのSHA-256の先頭16文字]
+バージョン2: 以下の14バイトをbase64url（パディングなし、19文字）にしたもの
+    バージョン(1バイト) | ライセンスタイプ(1バイト) | 有効期限の1970-01-01からの日数(4バイト)
+    | メールアドレスのSHA-256の先頭8バイト
+バージョン3: バージョン2と同じ14バイトの後ろに、その14バイトへの署名（10バイト）を付けた24バイトを
+    base64url（32文字）にしたもの（license_signing参照）
+"""
+import base64
+import struct
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+LICENSE_TYPE_CODES = {"trial": 1, "standard": 2, "professional": 3}  # 0はタイプ指定なし
+LICENSE_TYPE_NAMES = {code: name for name, code in LICENSE_TYPE_CODES.items()}
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+_PAYLOAD = struct.Struct(">BBI8s")  # バージョン, タイプ, 日数, ハッシュ
+_KEY_SIZES = {2: (19, _PAYLOAD.size), 3: (32, _PAYLOAD.size + 10)}  # バージョン → (文字数, バイト数)
+
+class LicenseInfo(NamedTuple):
+    """ライセンスキーから取り出した情報"""
+    version: int  # キーの形式のバージョン
+    expiry_date: datetime  # 有効期限
+    email_hash: str  # メールアドレスのハッシュ（16進数16文字）
+    license_type: str | None  # ライセンスタイプ（旧形式では不明）
+    signed_data: bytes = b""  # 署名の対象になったバイト列
+    signature: bytes | None = None  # 署名（署名のない形式ではNone）
+
+def encode_license_key(
+    email_hash: bytes,
+    expiry_date: datetime,
+    license_type: str | None = None,
+    sign: Callable[[bytes], bytes] | None = None,
+) -> str:
+    """
+    バイナリ形式のライセンスキーを作成します。
+    署名関数を指定した場合はバージョン3（署名付き）、指定しない場合はバージョン2になります。
+    有効期限は日単位で記録し、その日の終わりまで有効として扱います。
+    """
+    days = expiry_date.toordinal() - EPOCH_ORDINAL
+    if not 0 <= days < 2 ** 32:
+        raise ValueError("有効期限が範囲外です")
+    version = 2 if sign is None else 3
+    payload = _PAYLOAD.pack(version, LICENSE_TYPE_CODES.get(license_type, 0), days, email_hash[:8])
+    if sign is not None:
+        payload += sign(payload)
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_v1(license_key: str) -> LicenseInfo:
+    """旧形式のライセンスキーを分解"""
+    expiry_part, email_hash = license_key.split(":")
+    expiry_date = datetime.fromisoformat(base64.b64decode(expiry_part).decode())
+    return LicenseInfo(1, expiry_date, email_hash, None)
+
+def _decode_binary(license_key: str) -> LicenseInfo:
+    """バージョン2・3のライセンスキーを分解（日付の文字列解析は行わない）"""
+    payload = base64.urlsafe_b64decode(license_key + "=" * (-len(license_key) % 4))
+    version = payload[0] if payload else None
+    if version not in _KEY_SIZES:
+        raise ValueError(f"対応していないバージョンです: {version}")
+    # 不正な文字は読み飛ばされるので、文字数とバイト数の両方で確認する
+    if (len(license_key), len(payload)) != _KEY_SIZES[version]:
+        raise ValueError("ライセンスキーの長さが不正です")
+    version, type_code, days, email_hash = _PAYLOAD.unpack_from(payload)
+    # 有効期限の日の終わり（翌日の0時）まで有効
+    expiry_date = datetime.fromordinal(EPOCH_ORDINAL + days + 1)
+    signature = payload[_PAYLOAD.size:] if version == 3 else None
+    return LicenseInfo(
+        version,
+        expiry_date,
+        email_hash.hex(),
+        LICENSE_TYPE_NAMES.get(type_code),
+        payload[:_PAYLOAD.size],
+        signature,
+    )
+
+def canonical_license_key(license_key: str) -> str:
+    """
+    同じ内容を表すライセンスキーを1つの表記にそろえます（失効リストの照合に使う）。
+    base64の復号は「-」と「+」、「_」と「/」を区別せず、不正な文字や末尾の余りのビットも無視するので、
+    表記が違っても同じキーとして検証されます。復号した内容を符号化し直して表記をそろえます。
+    復号できないキーは前後の空白を除いてそのまま返します。
+    """
+    license_key = license_key.strip()
+    try:
+        if ":" in license_key:
+            expiry_part, email_hash = license_key.split(":")
+            return f"{base64.b64encode(base64.b64decode(expiry_part)).decode()}:{email_hash}"
+        payload = base64.urlsafe_b64decode(license_key + "=" * (-len(license_key) % 4))
+    except ValueError:  # binascii.ErrorもValueErrorのサブクラス
+        return license_key
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_license_key(license_key: str) -> LicenseInfo:
+    """
+    ライセンスキーの形式を判別して分解します。
+    形式が不正な場合はValueErrorを送出します。
+    """
+    if ":" in license_key:
+        return _decode_v1(license_key)
+    return _decode_binary(license_key)
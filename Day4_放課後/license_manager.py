@@ -1,8 +1,16 @@
+import asyncio
+import csv
 import hashlib
+import sqlite3
 import flet as ft
 from datetime import datetime, timedelta
 import base64
 
+from license_format import decode_license_key, encode_license_key
+from license_registry import IssuedLicense, LicenseRegistry
+from license_revocation import get_revocation_list
+from license_signing import get_signer
+
 def generate_license_components(email: str, expiry_date: datetime) -> tuple[str, str]:
     """
     メールアドレスと有効期限からライセンス構成要素を生成します。
@@ -23,20 +31,45 @@ def generate_license_components(email: str, expiry_date: datetime) -> tuple[str,
     
     return expiry_part, email_hash
 
-def generate_license_key(email: str, expiry_date: datetime) -> str:
+def generate_legacy_license_key(email: str, expiry_date: datetime) -> str:
     """
-    完全なライセンスキーを生成します。
+    旧形式のライセンスキーを生成します。
     形式: [有効期限部分]:[メールアドレスハッシュ部分]
     """
     expiry_part, email_hash = generate_license_components(email, expiry_date)
     return f"{expiry_part}:{email_hash}"
 
+def generate_license_key(email: str, expiry_date: datetime, license_type: str | None = None) -> str:
+    """
+    完全なライセンスキーを生成します。
+    形式: 有効期限・ライセンスタイプ・メールアドレスハッシュを詰めたバイナリに署名を付けてbase64urlにしたもの
+    （license_format参照。署名用の秘密鍵がなければ作成します）
+    """
+    email_hash = hashlib.sha256(email.encode()).digest()
+    return encode_license_key(email_hash, expiry_date, license_type, get_signer(create=True).sign)
+
+def calculate_expiry_date(start: datetime, license_type: str) -> datetime:
+    """ライセンスタイプに基づいて有効期限を計算"""
+    if license_type == "trial":
+        return start + timedelta(days=30)
+    elif license_type == "standard":
+        return start + timedelta(days=365)
+    else:  # professional
+        return start + timedelta(days=36500)  # 約100年（実質無期限）
+
 def main(page: ft.Page):
+    # license_batchはこのモジュールの関数を使うので、循環importにならないようここで読み込む
+    from license_batch import count_requests, default_output_path, issue_batch
+    
     page.title = "ライセンスキー発行システム"
     page.theme_mode = "light"
     page.padding = 40
     page.scroll = ft.ScrollMode.AUTO
     
+    # 発行したライセンスを記録する台帳
+    registry = LicenseRegistry()
+    REGISTRY_PAGE_SIZE = 50  # 台帳の一覧で1回に読み込む件数
+    
     # メールアドレス入力
     email_input = ft.TextField(
         label="メールアドレス",
@@ -70,52 +103,50 @@ def main(page: ft.Page):
         selectable=True,  # テキスト選択可能
     )
     
-    def calculate_expiry_date(start: datetime, license_type: str) -> datetime:
-        """ライセンスタイプに基づいて有効期限を計算"""
-        if license_type == "trial":
-            return start + timedelta(days=30)
-        elif license_type == "standard":
-            return start + timedelta(days=365)
-        else:  # professional
-            return start + timedelta(days=36500)  # 約100年（実質無期限）
-    
-    def generate_license(e):
-        """ライセンスキーを生成"""
+    def issue_license(email: str, license_type_value: str, start_value: str) -> str:
+        """
+        ライセンスキーを生成して台帳に記録し、表示する内容を返す
+        （イベントループを止めないよう別スレッドで実行する）
+        """
+        # 入力チェック
+        if not email:
+            raise ValueError("メールアドレスを入力してください")
+        if not license_type_value:
+            raise ValueError("ライセンスタイプを選択してください")
+        
+        # 開始日の処理
         try:
-            # 入力チェック
-            if not email_input.value:
-                raise ValueError("メールアドレスを入力してください")
-            if not license_type.value:
-                raise ValueError("ライセンスタイプを選択してください")
-            
-            # 開始日の処理
-            try:
-                if start_date.value:
-                    start = datetime.strptime(start_date.value, "%Y-%m-%d")
-                else:
-                    start = datetime.now()
-            except ValueError:
-                raise ValueError("開始日の形式が正しくありません（YYYY-MM-DD）")
-            
-            # 有効期限の計算
-            expiry = calculate_expiry_date(start, license_type.value)
-            
-            # ライセンスキーの生成
-            license_key = generate_license_key(email_input.value, expiry)
-            
-            # 検証用の表示（デバッグ目的）
-            expiry_part = license_key.split(':')[0]
-            decoded_expiry = datetime.fromisoformat(
-                base64.b64decode(expiry_part).decode()
-            )
-            
-            # 結果の表示
-            result_display.value = f"""
+            if start_value:
+                start = datetime.strptime(start_value, "%Y-%m-%d")
+            else:
+                start = datetime.now()
+        except ValueError:
+            raise ValueError("開始日の形式が正しくありません（YYYY-MM-DD）")
+        
+        # 有効期限の計算
+        expiry = calculate_expiry_date(start, license_type_value)
+        
+        # ライセンスキーの生成
+        license_key = generate_license_key(email, expiry, license_type_value)
+        
+        # 台帳に記録
+        registry.add(IssuedLicense(
+            email,
+            license_type_value,
+            start.strftime('%Y-%m-%d'),
+            expiry.strftime('%Y-%m-%d'),
+            license_key,
+        ))
+        
+        # 検証用の表示（デバッグ目的）
+        decoded = decode_license_key(license_key)
+        
+        return f"""
 ✅ ライセンスキーが生成されました
 
 ■ユーザー情報
-メールアドレス: {email_input.value}
-ライセンスタイプ: {license_type.value}
+メールアドレス: {email}
+ライセンスタイプ: {license_type_value}
 開始日: {start.strftime('%Y-%m-%d')}
 有効期限: {expiry.strftime('%Y-%m-%d')}
 
@@ -123,32 +154,195 @@ def main(page: ft.Page):
 {license_key}
 
 ※ユーザーはこのライセンスキーと登録したメールアドレスを使用して認証を行います。
+※発行したライセンスは台帳に記録されました。
 
 ■デバッグ情報
-有効期限部分デコード: {decoded_expiry}
+形式バージョン: {decoded.version}
+有効期限部分デコード: {decoded.expiry_date}（この日時まで有効）
+ライセンスタイプ: {decoded.license_type}
+署名: {decoded.signature.hex()}
 """
+    
+    async def generate_license(e):
+        """ライセンスキーを生成"""
+        # 生成中は連打できないようにする
+        generate_button.disabled = True
+        generate_button.update()
+        try:
+            result_display.value = await asyncio.to_thread(
+                issue_license, email_input.value, license_type.value, start_date.value
+            )
             result_display.color = ft.colors.GREEN
             copy_button.visible = True
             
-        except ValueError as e:
+        except (ValueError, OverflowError) as e:  # 入力の誤り・有効期限が日付の範囲を超える
             result_display.value = f"⚠️ エラー: {str(e)}"
             result_display.color = ft.colors.RED
             copy_button.visible = False
-            
-        page.update()
+        except (OSError, sqlite3.Error) as e:
+            # 秘密鍵や台帳のファイルに書き込めない場合
+            result_display.value = f"⚠️ 発行できませんでした: {str(e)}"
+            result_display.color = ft.colors.RED
+            copy_button.visible = False
+        finally:
+            # 失敗しても再び発行できるように、ボタンを必ず戻す
+            generate_button.disabled = False
+            # 変わったコントロールだけを送る
+            page.update(result_display, copy_button, generate_button)
+    
+    # コピーしたことを知らせるSnackBar（1つを使い回し、コピーのたびにコントロールを増やさない）
+    copy_snack = ft.SnackBar(
+        content=ft.Text("ライセンス情報をクリップボードにコピーしました"),
+        action="OK"
+    )
+    page.overlay.append(copy_snack)
     
-    def copy_to_clipboard(e):
+    async def copy_to_clipboard(e):
         """生成された情報をクリップボードにコピー"""
         if result_display.value:
             page.set_clipboard(result_display.value)
-            snack = ft.SnackBar(
-                content=ft.Text("ライセンス情報をクリップボードにコピーしました"),
-                action="OK"
-            )
-            page.add(snack)
-            snack.open = True
+            copy_snack.open = True
+            copy_snack.update()
+    
+    # 一括発行用
+    batch_status = ft.Text(width=400, selectable=True)
+    batch_progress = ft.ProgressBar(width=400, value=0, visible=False)
+    
+    def run_batch(input_path: str):
+        """顧客リストからライセンスキーを一括発行（バックグラウンドのスレッドで実行）"""
+        output_path = default_output_path(input_path)
+        try:
+            total = count_requests(input_path)
+            
+            def progress(issued: int, errors: int):
+                done = issued + errors
+                batch_progress.value = done / total if total else 1
+                batch_status.value = f"処理中... {done:,} / {total:,}件（エラー {errors:,}件）"
+                page.update()
+            
+            result = issue_batch(input_path, output_path, progress=progress, registry=registry)
+            batch_status.value = f"""
+✅ 一括発行が完了しました
+発行: {result.issued:,}件 / エラー: {result.errors:,}件
+処理時間: {result.seconds:.2f}秒（{result.keys_per_sec:,.0f} keys/sec）
+出力先: {output_path}
+"""
+            batch_status.color = ft.colors.GREEN
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            batch_status.value = f"⚠️ エラー: {str(e)}"
+            batch_status.color = ft.colors.RED
+        finally:
+            # 途中で失敗しても、進捗表示を消して再び一括発行できるようにする
+            batch_progress.visible = False
+            batch_button.disabled = False
             page.update()
     
+    def batch_file_picked(e: ft.FilePickerResultEvent):
+        """顧客リストが選択されたら一括発行を開始"""
+        if not e.files:
+            return
+        batch_button.disabled = True
+        batch_progress.value = 0
+        batch_progress.visible = True
+        batch_status.value = "顧客リストを読み込んでいます..."
+        batch_status.color = None
+        page.update()
+        # 発行中も画面を操作できるように別スレッドで実行する
+        page.run_thread(run_batch, e.files[0].path)
+    
+    batch_picker = ft.FilePicker(on_result=batch_file_picked)
+    page.overlay.append(batch_picker)
+    
+    # 発行済みライセンスの一覧用
+    registry_email = ft.TextField(label="メールアドレス", width=250)
+    registry_type = ft.Dropdown(
+        label="ライセンスタイプ",
+        width=200,
+        value="all",
+        options=[
+            ft.dropdown.Option("all", "すべて"),
+            ft.dropdown.Option("trial", "トライアル版"),
+            ft.dropdown.Option("standard", "スタンダード版"),
+            ft.dropdown.Option("professional", "プロフェッショナル版"),
+        ]
+    )
+    registry_expiring = ft.Checkbox(label="30日以内に期限切れ")
+    registry_table = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("メールアドレス")),
+            ft.DataColumn(ft.Text("タイプ")),
+            ft.DataColumn(ft.Text("開始日")),
+            ft.DataColumn(ft.Text("有効期限")),
+            ft.DataColumn(ft.Text("ライセンスキー")),
+        ],
+        rows=[],
+    )
+    registry_info = ft.Text()
+    registry_query = {"filters": {}, "cursor": None}  # 表示中の検索条件と次のページのカーソル
+    
+    def load_registry_page():
+        """台帳の次のページを読み込んで一覧の末尾に追加"""
+        licenses, cursor = registry.search(
+            **registry_query["filters"],
+            after=registry_query["cursor"],
+            limit=REGISTRY_PAGE_SIZE,
+        )
+        registry_query["cursor"] = cursor
+        registry_table.rows.extend(
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(lic.email)),
+                ft.DataCell(ft.Text(lic.license_type)),
+                ft.DataCell(ft.Text(lic.start_date)),
+                ft.DataCell(ft.Text(lic.expiry_date)),
+                ft.DataCell(ft.Text(lic.license_key, selectable=True)),
+            ])
+            for lic in licenses
+        )
+        registry_more_button.visible = cursor is not None
+        registry_info.value = f"{len(registry_table.rows):,}件を表示中" + ("" if cursor is None else "（続きあり）")
+    
+    def search_registry(e):
+        """検索条件を変えて台帳の一覧を最初のページから表示"""
+        registry_query["filters"] = {
+            "email": registry_email.value.strip() or None,
+            "license_type": None if registry_type.value == "all" else registry_type.value,
+            "expires_within": 30 if registry_expiring.value else None,
+        }
+        registry_query["cursor"] = None
+        registry_table.rows.clear()
+        load_registry_page()
+        page.update()
+    
+    def load_more_registry(e):
+        """台帳の一覧の続きを表示"""
+        load_registry_page()
+        page.update()
+    
+    # ライセンスの失効用
+    revoke_input = ft.TextField(
+        label="失効させるライセンスキー",
+        width=400,
+        helper_text="漏えいしたキーなどを有効期限前に無効にします"
+    )
+    revoke_reason = ft.TextField(label="理由（任意）", width=400)
+    revoke_status = ft.Text(width=400)
+    
+    def revoke_license(e):
+        """ライセンスキーを失効リストに追加"""
+        license_key = revoke_input.value.strip()
+        if not license_key:
+            revoke_status.value = "⚠️ エラー: ライセンスキーを入力してください"
+            revoke_status.color = ft.colors.RED
+        elif get_revocation_list().revoke(license_key, revoke_reason.value.strip()):
+            revoke_status.value = f"✅ 失効させました: {license_key}"
+            revoke_status.color = ft.colors.GREEN
+            revoke_input.value = ""
+            revoke_reason.value = ""
+        else:
+            revoke_status.value = f"このキーはすでに失効しています: {license_key}"
+            revoke_status.color = None
+        page.update()
+    
     # ボタンの作成
     generate_button = ft.ElevatedButton(
         "ライセンスキーを生成",
@@ -162,6 +356,34 @@ def main(page: ft.Page):
         visible=False
     )
     
+    registry_search_button = ft.ElevatedButton(
+        "検索",
+        icon=ft.icons.SEARCH,
+        on_click=search_registry
+    )
+    
+    registry_more_button = ft.TextButton(
+        "さらに読み込む",
+        on_click=load_more_registry,
+        visible=False
+    )
+    
+    revoke_button = ft.ElevatedButton(
+        "失効させる",
+        icon=ft.icons.BLOCK,
+        on_click=revoke_license,
+        width=200
+    )
+    
+    batch_button = ft.ElevatedButton(
+        "顧客リストを選択",
+        icon=ft.icons.UPLOAD_FILE,
+        on_click=lambda _: batch_picker.pick_files(
+            allowed_extensions=["csv", "jsonl", "ndjson"],
+        ),
+        width=200
+    )
+    
     # レイアウトの構築
     page.add(
         ft.Text("ライセンスキー発行システム", size=32, weight="bold"),
@@ -179,7 +401,47 @@ def main(page: ft.Page):
             padding=20,
             border_radius=10,
             border=ft.border.all(1, ft.colors.BLUE_200)
+        ),
+        ft.Text("一括発行", size=24, weight="bold"),
+        ft.Container(
+            content=ft.Column([
+                ft.Text("CSV / JSON Lines（email, license_type, start_date）の顧客リストからまとめて発行します"),
+                batch_button,
+                batch_progress,
+                batch_status,
+            ]),
+            padding=20,
+            border_radius=10,
+            border=ft.border.all(1, ft.colors.BLUE_200)
+        ),
+        ft.Text("発行済みライセンス", size=24, weight="bold"),
+        ft.Container(
+            content=ft.Column([
+                ft.Row([registry_email, registry_type, registry_expiring, registry_search_button], wrap=True),
+                registry_info,
+                ft.Row([registry_table], scroll=ft.ScrollMode.AUTO),
+                registry_more_button,
+            ]),
+            padding=20,
+            border_radius=10,
+            border=ft.border.all(1, ft.colors.BLUE_200)
+        ),
+        ft.Text("ライセンスの失効", size=24, weight="bold"),
+        ft.Container(
+            content=ft.Column([
+                revoke_input,
+                revoke_reason,
+                revoke_button,
+                revoke_status,
+            ]),
+            padding=20,
+            border_radius=10,
+            border=ft.border.all(1, ft.colors.BLUE_200)
         )
     )
+    # 台帳の一覧は最初のページだけ読み込んでおく
+    load_registry_page()
+    page.update()
 
-ft.app(target=main)
\ No newline at end of file
+if __name__ == "__main__":
+    ft.app(target=main)
@@ -0,0 +1,157 @@
+"""
+発行済みライセンスの台帳
+
+発行したライセンスキーをSQLiteに記録し、メールアドレス・有効期限・ライセンスタイプで検索できるようにします。
+検索結果は(有効期限, ID)をキーにしたページ単位で返すので、件数が多くても必要な分だけ読み込めます。
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "licenses.db")
+
+def email_hash(email: str) -> str:
+    """台帳の検索に使うメールアドレスのハッシュ"""
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+@dataclass(slots=True)
+class IssuedLicense:
+    """台帳に記録された1件のライセンス"""
+    email: str  # メールアドレス
+    license_type: str  # ライセンスタイプ
+    start_date: str  # 開始日（YYYY-MM-DD）
+    expiry_date: str  # 有効期限（YYYY-MM-DD）
+    license_key: str  # ライセンスキー
+    issued_at: float = field(default_factory=time.time)  # 発行日時（UNIX時間）
+    id: int | None = None  # 台帳のID（記録するまではNone）
+
+class LicenseRegistry:
+    """
+    SQLiteを使った発行済みライセンスの台帳
+    よく使う検索（メールアドレス・期限が近いもの・ライセンスタイプ別）にはそれぞれインデックスを用意しています。
+    """
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS licenses (
+            id INTEGER PRIMARY KEY,
+            email TEXT NOT NULL,
+            email_hash TEXT NOT NULL,
+            license_type TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            expiry_date TEXT NOT NULL,
+            license_key TEXT NOT NULL UNIQUE,
+            issued_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS licenses_email_hash ON licenses (email_hash, expiry_date, id)",
+        "CREATE INDEX IF NOT EXISTS licenses_expiry ON licenses (expiry_date, id)",
+        "CREATE INDEX IF NOT EXISTS licenses_type ON licenses (license_type, expiry_date, id)",
+    ]
+    COLUMNS = "email, license_type, start_date, expiry_date, license_key, issued_at, id"
+
+    def __init__(self, path: str = REGISTRY_PATH):
+        self.path = path  # データベースファイルのパス
+        # テーブル・インデックスの作成とWALモードの設定（一括発行中でも検索がブロックされない）
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """データベースに接続（UIのスレッドと一括発行のスレッドで別々に接続する）"""
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add_many(self, licenses: Iterable[IssuedLicense]) -> int:
+        """
+        ライセンスをまとめて記録し、実際に記録した件数を返す（1回のトランザクションで書き込む）
+        すでに記録済みのキーは無視するので、渡した件数より少なくなることがある
+        """
+        rows = [
+            (lic.email, email_hash(lic.email), lic.license_type, lic.start_date,
+             lic.expiry_date, lic.license_key, lic.issued_at)
+            for lic in licenses
+        ]
+        conn = self._connect()
+        try:
+            changes = conn.total_changes
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO licenses"
+                    " (email, email_hash, license_type, start_date, expiry_date, license_key, issued_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            return conn.total_changes - changes
+        finally:
+            conn.close()
+
+    def add(self, license: IssuedLicense):
+        """ライセンスを1件記録"""
+        self.add_many([license])
+
+    def search(
+        self,
+        email: str | None = None,
+        license_type: str | None = None,
+        expires_within: int | None = None,
+        after: tuple[str, int] | None = None,
+        limit: int = 50,
+    ) -> tuple[list[IssuedLicense], tuple[str, int] | None]:
+        """
+        条件に合うライセンスを有効期限の近い順に1ページ分返します。
+
+        Args:
+            email (str | None): メールアドレスで絞り込む
+            license_type (str | None): ライセンスタイプで絞り込む
+            expires_within (int | None): 今日から指定した日数以内に期限が切れるもので絞り込む
+            after (tuple[str, int] | None): 前のページの続きから取得する場合、前のページが返したカーソル
+            limit (int): 1ページの件数
+
+        Returns:
+            tuple: (ライセンスのリスト, 次のページのカーソル（最後のページではNone）)
+        """
+        conditions, params = [], []
+        if email:
+            conditions.append("email_hash = ?")
+            params.append(email_hash(email))
+        if license_type:
+            conditions.append("license_type = ?")
+            params.append(license_type)
+        if expires_within is not None:
+            today = datetime.now().date()
+            conditions.append("expiry_date BETWEEN ? AND ?")
+            params += [today.isoformat(), (today + timedelta(days=expires_within)).isoformat()]
+        if after is not None:
+            # OFFSETで読み飛ばさず、前のページの最後の(有効期限, ID)より後ろから読む
+            conditions.append("(expiry_date, id) > (?, ?)")
+            params += list(after)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {self.COLUMNS} FROM licenses{where} ORDER BY expiry_date, id LIMIT ?",
+                params + [limit + 1],  # 1件多く読んで次のページがあるかを判定する
+            ).fetchall()
+        finally:
+            conn.close()
+        licenses = [IssuedLicense(*row) for row in rows[:limit]]
+        cursor = (licenses[-1].expiry_date, licenses[-1].id) if len(rows) > limit else None
+        return licenses, cursor
+
+    def count(self) -> int:
+        """記録されているライセンスの件数"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM licenses").fetchone()[0]
+        finally:
+            conn.close()
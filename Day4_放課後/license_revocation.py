@@ -0,0 +1,264 @@
+"""
+ライセンスキーの失効リスト
+
+失効させたキーはSQLiteに正確に記録し、その手前にメモリ上のブルームフィルターを置きます。
+ほとんどのキーは失効していないので、フィルターで「含まれない」と分かればディスクを読まずに判定できます。
+フィルターが「含まれるかもしれない」と答えた場合だけSQLiteで確認します（誤判定は起こりません）。
+キーはcanonical_license_keyで表記をそろえてから記録・照合するので、「-」を「+」に変えたような同じ内容のキーも失効扱いになります。
+別のプロセス（発行画面やCLI）で失効させたキーも反映されるように、判定の際にフィルターのファイルが
+更新されていないかをREFRESH_INTERVAL秒ごとに確認し、更新されていれば読み込み直します。
+
+使い方:
+    python license_revocation.py revoke <ライセンスキー> [--reason 理由]
+    python license_revocation.py revoke-file keys.txt   # 1行に1キー
+    python license_revocation.py check <ライセンスキー>
+    python license_revocation.py rebuild                 # データベースからフィルターを作り直して保存
+"""
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable
+
+from license_format import canonical_license_key
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REVOCATION_PATH = os.path.join(BASE_DIR, "revocations.db")
+FILTER_PATH = os.path.join(BASE_DIR, "revocations.bloom")
+REVOCATION_DIR_ENV = "LICENSE_REVOCATION_DIR"  # 失効リストを置くディレクトリを変える環境変数（ベンチマークなど）
+
+class BloomFilter:
+    """
+    ビット配列とk個のハッシュ関数で集合を表すブルームフィルター
+    「含まれない」という答えは常に正しく、「含まれる」という答えはerror_rateの確率で誤りです。
+    """
+    HEADER = struct.Struct(">QIQ")  # ビット数, ハッシュ関数の数, 追加した件数
+    MAX_HASHES = 16  # blake2bの出力（最大64バイト）から取り出せるハッシュ値の数
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if size >= 2 ** 32:
+            raise ValueError("フィルターが大きすぎます")
+        hashes = min(self.MAX_HASHES, max(1, round(size / capacity * math.log(2))))
+        self._setup(size, hashes)
+        self.capacity = capacity  # 誤判定率を保てる件数
+        self.count = 0  # 追加した件数
+        self.bits = bytearray((size + 7) // 8)
+
+    def _setup(self, size: int, hashes: int):
+        """ビット数とハッシュ関数の数を設定"""
+        self.size = size  # ビット数
+        self.hashes = hashes  # ハッシュ関数の数
+        # 1回のblake2bの出力を4バイトずつに分け、それぞれを1つのハッシュ関数の値として使う
+        self._unpack = struct.Struct(f"<{hashes}I").unpack
+
+    def _positions(self, item: bytes) -> tuple[int, ...]:
+        """itemに対応するハッシュ値（ビットの位置はこれをsizeで割った余り）"""
+        return self._unpack(hashlib.blake2b(item, digest_size=4 * self.hashes).digest())
+
+    def add(self, item: bytes):
+        """要素を追加"""
+        bits, size = self.bits, self.size
+        for h in self._positions(item):
+            pos = h % size
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: bytes) -> bool:
+        bits, size = self.bits, self.size
+        for h in self._positions(item):
+            pos = h % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False  # 1つでも立っていないビットがあれば含まれない
+        return True
+
+    def to_bytes(self) -> bytes:
+        """ファイルに保存するためのバイト列"""
+        return self.HEADER.pack(self.size, self.hashes, self.count) + self.bits
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        """to_bytesで作ったバイト列から復元"""
+        size, hashes, count = cls.HEADER.unpack_from(data)
+        if not (0 < size < 2 ** 32 and 0 < hashes <= cls.MAX_HASHES):
+            raise ValueError("フィルターのファイルが壊れています")
+        bloom = cls.__new__(cls)
+        bloom._setup(size, hashes)
+        bloom.count = count
+        bloom.capacity = max(1, round(size * math.log(2) / hashes))
+        bloom.bits = bytearray(data[cls.HEADER.size:])
+        if len(bloom.bits) != (size + 7) // 8:
+            raise ValueError("フィルターのファイルが壊れています")
+        return bloom
+
+class RevocationList:
+    """
+    失効したライセンスキーの一覧
+    SQLiteの正確な一覧と、それを要約したブルームフィルターをまとめて管理します。
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS revoked (
+            license_key TEXT PRIMARY KEY,
+            revoked_at REAL NOT NULL,
+            reason TEXT NOT NULL DEFAULT ''
+        ) WITHOUT ROWID
+    """
+    MIN_CAPACITY = 100_000  # フィルターの最小の容量
+    REFRESH_INTERVAL = 1.0  # フィルターのファイルが更新されていないかを確認する間隔（秒）
+
+    def __init__(self, path: str = REVOCATION_PATH, filter_path: str = FILTER_PATH):
+        self.path = path  # データベースファイルのパス
+        self.filter_path = filter_path  # フィルターを保存するファイルのパス
+        self.lock = threading.Lock()
+        # 検証はどのスレッドからも呼ばれるので、接続を共有してロックで守る
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(self.SCHEMA)
+        self.filter_stamp = None  # 最後に読み書きしたフィルターのファイルの(更新日時, サイズ)
+        self.checked_at = time.monotonic()  # 最後にファイルの更新を確認した時刻
+        self.bloom = self._load_filter()
+
+    def _count(self) -> int:
+        """失効しているキーの件数"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM revoked").fetchone()[0]
+
+    def _load_filter(self) -> BloomFilter:
+        """保存済みのフィルターを読み込む（ないか、データベースと件数が合わなければ作り直す）"""
+        try:
+            stamp = self._stamp()
+            with open(self.filter_path, "rb") as f:
+                bloom = BloomFilter.from_bytes(f.read())
+            if bloom.count == self._count():
+                self.filter_stamp = stamp
+                return bloom
+        except (OSError, ValueError, struct.error):
+            pass
+        return self.rebuild()
+
+    def rebuild(self) -> BloomFilter:
+        """データベースからフィルターを作り直して保存（件数に合わせて容量も決め直す）"""
+        count = self._count()
+        bloom = BloomFilter(max(self.MIN_CAPACITY, count * 2))
+        with self.lock:
+            for (license_key,) in self.conn.execute("SELECT license_key FROM revoked"):
+                bloom.add(license_key.encode())
+        self.bloom = bloom
+        self.save_filter()
+        return bloom
+
+    def save_filter(self):
+        """フィルターをファイルに保存（書き込み途中のファイルを読まれないように置き換える）"""
+        tmp_path = f"{self.filter_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.bloom.to_bytes())
+        os.replace(tmp_path, self.filter_path)
+        self.filter_stamp = self._stamp()
+
+    def _stamp(self) -> tuple[int, int] | None:
+        """フィルターのファイルの(更新日時, サイズ)（ファイルがなければNone）"""
+        try:
+            stat = os.stat(self.filter_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """別のプロセスがフィルターを更新していれば読み込み直す"""
+        self.checked_at = time.monotonic()
+        if self._stamp() != self.filter_stamp:
+            self.bloom = self._load_filter()
+
+    def revoke_many(self, license_keys: Iterable[str], reason: str = "") -> int:
+        """キーをまとめて失効させ、新しく失効させた件数を返す"""
+        now = time.time()
+        added = 0
+        with self.lock, self.conn:
+            for license_key in license_keys:
+                license_key = canonical_license_key(license_key)
+                if not license_key:
+                    continue
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO revoked (license_key, revoked_at, reason) VALUES (?, ?, ?)",
+                    (license_key, now, reason),
+                )
+                if cursor.rowcount:
+                    self.bloom.add(license_key.encode())
+                    added += 1
+        if self.bloom.count > self.bloom.capacity or self.bloom.count != self._count():
+            # 容量を超えると誤判定が増えるので大きくして作り直す
+            # 件数が合わない場合は別のプロセスも失効させているので、その分も含めて作り直す
+            self.rebuild()
+        else:
+            self.save_filter()
+        return added
+
+    def revoke(self, license_key: str, reason: str = "") -> bool:
+        """キーを失効させる（すでに失効していた場合はFalse）"""
+        return self.revoke_many([license_key], reason) == 1
+
+    def is_revoked(self, license_key: str) -> bool:
+        """キーが失効しているかを判定（表記の違うキーも同じキーとして扱う）"""
+        if time.monotonic() - self.checked_at >= self.REFRESH_INTERVAL:
+            self.refresh()
+        license_key = canonical_license_key(license_key)
+        if license_key.encode() not in self.bloom:
+            return False  # ほとんどのキーはここで判定が終わる（ディスクを読まない）
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM revoked WHERE license_key = ?", (license_key,)
+            ).fetchone()
+        return row is not None
+
+    def close(self):
+        """データベースとの接続を閉じる"""
+        self.conn.close()
+
+@lru_cache(maxsize=None)
+def get_revocation_list() -> RevocationList:
+    """
+    プロセス内で共有する失効リスト（フィルターの読み込みは最初の1回だけ）
+    環境変数 LICENSE_REVOCATION_DIR があれば、そのディレクトリの失効リストを使う
+    """
+    directory = os.environ.get(REVOCATION_DIR_ENV)
+    if directory:
+        return RevocationList(os.path.join(directory, "revocations.db"), os.path.join(directory, "revocations.bloom"))
+    return RevocationList()
+
+def main():
+    parser = argparse.ArgumentParser(description="ライセンスキーの失効リストの管理")
+    commands = parser.add_subparsers(dest="command", required=True)
+    revoke = commands.add_parser("revoke", help="キーを失効させる")
+    revoke.add_argument("license_key")
+    revoke.add_argument("--reason", default="", help="失効の理由")
+    revoke_file = commands.add_parser("revoke-file", help="ファイルに書かれたキー（1行に1キー）をまとめて失効させる")
+    revoke_file.add_argument("path")
+    revoke_file.add_argument("--reason", default="", help="失効の理由")
+    check = commands.add_parser("check", help="キーが失効しているかを確認")
+    check.add_argument("license_key")
+    commands.add_parser("rebuild", help="データベースからフィルターを作り直して保存")
+    args = parser.parse_args()
+
+    revocations = RevocationList()
+    if args.command == "revoke":
+        added = revocations.revoke(args.license_key, args.reason)
+        print("失効させました" if added else "すでに失効しています")
+    elif args.command == "revoke-file":
+        with open(args.path, encoding="utf-8") as f:
+            added = revocations.revoke_many(f, args.reason)
+        print(f"{added:,}件を失効させました")
+    elif args.command == "check":
+        print("失効しています" if revocations.is_revoked(args.license_key.strip()) else "失効していません")
+    else:
+        bloom = revocations.rebuild()
+        print(f"{bloom.count:,}件でフィルターを作り直しました（{len(bloom.bits):,}バイト、ハッシュ関数{bloom.hashes}個）")
+    revocations.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+ライセンスキーの一括検証
+
+同じ(メールアドレス, ライセンスキー)の組を何度も検証するときのために、検証結果をLRUキャッシュに保持します。
+キャッシュした結果は、メッセージが変わる時刻（残り日数が減る時刻・期限切れになる時刻）まで使います。
+
+使い方:
+    # 標準入力からJSON Lines（{"email": ..., "license_key": ...}）を読み、結果を1行ずつ出力
+    python license_service.py --stdin < licenses.jsonl
+    # ローカルのHTTPサーバーとして起動（POST /verify、GET /stats）
+    python license_service.py --port 8765
+"""
+import argparse
+import json
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+
+from license_format import decode_license_key
+from license_revocation import RevocationList, get_revocation_list
+from license_system import (
+    MALFORMED_MESSAGE, REVOKED_MESSAGE, SIGNATURE_MESSAGE, check_license, is_authentic,
+)
+
+def result_valid_until(expiry_date: datetime, now: datetime) -> datetime:
+    """
+    nowの時点の検証結果が変わらずに使える期限を返します。
+    メッセージには日数が含まれるので、有効期限の時刻から1日ごとに結果が変わります。
+    """
+    if expiry_date < now:
+        # 期限切れの日数が1日増える時刻
+        return expiry_date + timedelta(days=(now - expiry_date).days + 1)
+    # 残り日数が1日減る時刻（最後は有効期限そのもの）
+    return expiry_date - timedelta(days=(expiry_date - now).days)
+
+class LicenseVerifier:
+    """
+    検証結果をキャッシュするライセンス検証器
+    キャッシュは(メールアドレス, ライセンスキー)をキーにしたLRUで、複数のスレッドから使えます。
+    有効という結果をキャッシュから返す時も、失効リストだけは毎回確認します。
+    """
+    def __init__(self, maxsize: int = 10000, revocations: RevocationList | None = None):
+        self.maxsize = maxsize  # キャッシュする組の最大数
+        self.revocations = revocations or get_revocation_list()  # 失効リスト
+        self.cache = OrderedDict()  # (email, license_key) → (結果が変わる時刻, 検証結果)
+        self.lock = threading.Lock()
+        # 統計情報
+        self.hits = 0  # キャッシュの結果を使った回数
+        self.misses = 0  # キャッシュになく検証した回数
+        self.expired = 0  # キャッシュの結果が古くなっていて検証し直した回数
+
+    def verify(self, email: str, license_key: str, now: datetime | None = None) -> tuple[bool, str]:
+        """ライセンスキーを検証（キャッシュに有効な結果があればそれを返す）"""
+        now = now or datetime.now()
+        key = (email, license_key)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                valid_until, result = entry
+                # 有効という結果は、その後に失効させられていないかも確認する（ほぼフィルターだけで済む）
+                if now < valid_until and not (result[0] and self.revocations.is_revoked(license_key)):
+                    self.hits += 1
+                    self.cache.move_to_end(key)
+                    return result
+                self.expired += 1
+            self.misses += 1
+
+        result, valid_until = self._evaluate(email, license_key, now)
+        with self.lock:
+            self.cache[key] = (valid_until, result)
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)  # 最も長く使われていない組を捨てる
+        return result
+
+    def verify_many(self, pairs: Iterable[tuple[str, str]]) -> list[tuple[bool, str]]:
+        """(メールアドレス, ライセンスキー)の組をまとめて検証（時刻は最初に1回だけ取得）"""
+        now = datetime.now()
+        return [self.verify(email, license_key, now) for email, license_key in pairs]
+
+    def _evaluate(self, email: str, license_key: str, now: datetime) -> tuple[tuple[bool, str], datetime]:
+        """ライセンスキーを検証し、(検証結果, 結果が変わる時刻)を返す"""
+        try:
+            info = decode_license_key(license_key)
+        except ValueError:
+            # 形式が不正なキーは時間がたっても結果が変わらない
+            return (False, MALFORMED_MESSAGE), datetime.max
+        try:
+            if not is_authentic(info):
+                return (False, SIGNATURE_MESSAGE), datetime.max
+            if self.revocations.is_revoked(license_key):
+                return (False, REVOKED_MESSAGE), datetime.max
+            result = check_license(email, info.expiry_date, info.email_hash, now)
+            return result, result_valid_until(info.expiry_date, now)
+        except ValueError:
+            return (False, MALFORMED_MESSAGE), datetime.max
+        except Exception as e:
+            # 秘密鍵が用意されていない・日時の形式が違う古いキーなど（結果はキャッシュしない）
+            return (False, f"検証エラー: {str(e)}"), now
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self) -> dict:
+        """キャッシュのヒット率などの統計情報"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+@lru_cache(maxsize=None)
+def get_default_verifier() -> LicenseVerifier:
+    """モジュール共通の検証器（失効リストのファイルは最初に使う時に開く）"""
+    return LicenseVerifier()
+
+def verify_licenses(
+    pairs: Iterable[tuple[str, str]],
+    verifier: LicenseVerifier | None = None,
+) -> list[tuple[bool, str]]:
+    """
+    ライセンスキーをまとめて検証します。
+
+    Args:
+        pairs (Iterable[tuple[str, str]]): (メールアドレス, ライセンスキー)の組
+        verifier (LicenseVerifier | None): 使用する検証器（Noneの場合はモジュール共通の検証器）
+
+    Returns:
+        list[tuple[bool, str]]: 組ごとの(検証結果, メッセージ)
+    """
+    return (verifier or get_default_verifier()).verify_many(pairs)
+
+def _verify_item(verifier: LicenseVerifier, item) -> dict:
+    """JSONで受け取った1件を検証し、結果を付けて返す（オブジェクトでなければエラーを返す）"""
+    if not isinstance(item, dict):
+        return {"error": "検証するライセンスは {\"email\": ..., \"license_key\": ...} の形式で指定してください"}
+    email = str(item.get("email", "")).strip()
+    license_key = str(item.get("license_key", "")).strip()
+    is_valid, message = verifier.verify(email, license_key)
+    return {"email": email, "license_key": license_key, "valid": is_valid, "message": message}
+
+def serve_stdin(verifier: LicenseVerifier):
+    """標準入力のJSON Linesを1行ずつ検証し、結果を標準出力に書き出す"""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            result = _verify_item(verifier, json.loads(line))
+        except json.JSONDecodeError as e:
+            result = {"error": f"JSONの形式が不正です: {e}"}
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    print(json.dumps(verifier.stats()), file=sys.stderr)
+
+def serve_http(verifier: LicenseVerifier, host: str = "127.0.0.1", port: int = 8765):
+    """ローカルのHTTPサーバーとして検証を受け付ける"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, verifier.stats())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            """1件（オブジェクト）またはまとめて（配列）検証する"""
+            if self.path != "/verify":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length))
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {"error": f"JSONの形式が不正です: {e}"})
+                return
+            if isinstance(body, list):
+                self._send_json(200, [_verify_item(verifier, item) for item in body])
+            elif isinstance(body, dict):
+                self._send_json(200, _verify_item(verifier, body))
+            else:
+                self._send_json(400, _verify_item(verifier, body))
+
+        def log_message(self, format, *args):
+            pass  # リクエストごとのログは出さない
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"http://{host}:{port}/verify で検証を受け付けています（Ctrl+Cで終了）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="ライセンスキーの一括検証")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--stdin", action="store_true", help="標準入力のJSON Linesを検証")
+    mode.add_argument("--port", type=int, help="HTTPサーバーとして起動するポート番号")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTPサーバーのホスト")
+    parser.add_argument("--cache-size", type=int, default=10000, help="キャッシュする組の最大数")
+    args = parser.parse_args()
+
+    verifier = LicenseVerifier(args.cache_size)
+    if args.stdin:
+        serve_stdin(verifier)
+    else:
+        serve_http(verifier, args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+ライセンスキーの署名
+
+発行側と認証側で共有する秘密鍵を使い、HMAC-SHA256でキーの内容に署名します。
+秘密鍵は環境変数 LICENSE_SECRET_KEY（16進数）か、このファイルと同じ場所の license_secret.key から読み込みます。
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from functools import lru_cache
+
+SECRET_ENV = "LICENSE_SECRET_KEY"
+SECRET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "license_secret.key")
+SIGNATURE_SIZE = 10  # キーに含める署名のバイト数（HMAC-SHA256の先頭80ビット）
+
+class LicenseSigner:
+    """
+    秘密鍵を読み込んだHMACを保持し、キーごとにコピーして署名・検証する
+    鍵の処理は最初の1回だけで済むので、1件あたりの署名・検証は数マイクロ秒で終わります。
+    """
+    def __init__(self, secret: bytes):
+        self._base = hmac.new(secret, digestmod=hashlib.sha256)  # 鍵を処理済みのHMAC
+
+    def sign(self, payload: bytes) -> bytes:
+        """キーの内容に対する署名を作成"""
+        mac = self._base.copy()
+        mac.update(payload)
+        return mac.digest()[:SIGNATURE_SIZE]
+
+    def verify(self, payload: bytes, signature: bytes) -> bool:
+        """署名が正しいかを確認（比較にかかる時間から署名を推測されないようにする）"""
+        return hmac.compare_digest(self.sign(payload), signature)
+
+def load_secret(create: bool = False) -> bytes:
+    """
+    秘密鍵を読み込みます。
+    create=Trueの場合、秘密鍵がなければ新しく作成して保存します（発行側で使用）。
+    """
+    if os.environ.get(SECRET_ENV):
+        return bytes.fromhex(os.environ[SECRET_ENV])
+    if create and not os.path.exists(SECRET_PATH):
+        # 所有者だけが読み書きできるファイルとして作成する
+        fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    try:
+        with open(SECRET_PATH) as f:
+            return bytes.fromhex(f.read().strip())
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"署名用の秘密鍵がありません（{SECRET_PATH} を配置するか環境変数 {SECRET_ENV} を設定してください）"
+        ) from None
+
+@lru_cache(maxsize=None)
+def get_signer(create: bool = False) -> LicenseSigner:
+    """プロセス内で共有する署名器（秘密鍵の読み込みは最初の1回だけ）"""
+    return LicenseSigner(load_secret(create))
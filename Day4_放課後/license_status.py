@@ -0,0 +1,60 @@
+"""
+ライセンス認証結果の保存
+
+最後に認証に成功した結果をファイルに保存しておき、次回の起動時にすぐ表示できるようにします。
+保存した結果は、ライセンスの有効期限かオフラインで使える期間のどちらか早い方まで使えます。
+表示した後はバックグラウンドで検証し直すので、失効などがあればすぐに反映されます。
+"""
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from license_format import decode_license_key
+
+STATUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "license_status.json")
+OFFLINE_GRACE = timedelta(days=7)  # 検証し直せなくても保存した結果を使える期間
+
+@dataclass
+class CachedStatus:
+    """保存した認証結果"""
+    email: str  # メールアドレス
+    license_key: str  # ライセンスキー
+    is_valid: bool  # 認証結果
+    message: str  # 認証結果のメッセージ
+    checked_at: float  # 認証した日時（UNIX時間）
+    valid_until: float  # この結果を使える期限（UNIX時間）
+
+def save_status(email: str, license_key: str, is_valid: bool, message: str, path: str = STATUS_PATH):
+    """認証結果を保存（認証に失敗した場合は保存済みの結果を消す）"""
+    if not is_valid:
+        clear_status(path)
+        return
+    now = datetime.now()
+    expiry_date = decode_license_key(license_key).expiry_date
+    valid_until = min(expiry_date, now + OFFLINE_GRACE)
+    status = CachedStatus(email, license_key, is_valid, message, now.timestamp(), valid_until.timestamp())
+    # 書き込み途中のファイルを読まれないように置き換える
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(status), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_status(path: str = STATUS_PATH) -> CachedStatus | None:
+    """保存した認証結果を読み込む（ないか、期限が切れている場合はNone）"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            status = CachedStatus(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    if time.time() >= status.valid_until:
+        return None
+    return status
+
+def clear_status(path: str = STATUS_PATH):
+    """保存した認証結果を消す"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,49 @@
 import hashlib
+import logging
+import os
 import flet as ft
 from datetime import datetime
-import base64
+from typing import Iterable
+
+from license_format import LicenseInfo, decode_license_key
+from license_revocation import RevocationList, get_revocation_list
+from license_signing import LicenseSigner, get_signer
+from license_status import CachedStatus, load_status, save_status
+
+logger = logging.getLogger(__name__)
+
+MALFORMED_MESSAGE = "ライセンスキーの形式が不正です"
+SIGNATURE_MESSAGE = "ライセンスキーの署名が不正です"
+REVOKED_MESSAGE = "ライセンスは失効しています"
+LEGACY_KEYS_ENV = "LICENSE_ALLOW_LEGACY_KEYS"
+# 署名導入前に発行した旧形式（v1）のキーを受け付けるか（環境変数に1を設定した場合だけ）
+ALLOW_LEGACY_KEYS = os.environ.get(LEGACY_KEYS_ENV) == "1"
+
+def is_authentic(info: LicenseInfo, signer: LicenseSigner | None = None) -> bool:
+    """
+    ライセンスキーの署名を確認します（signerを省略した場合は共有の署名器を使用）。
+    署名のないバイナリ形式（v2）のキーは誰でも作れるので常に拒否し、
+    旧形式（v1）のキーはALLOW_LEGACY_KEYSで明示的に許可した場合だけ受け付けます。
+    """
+    if info.signature is None:
+        return info.version == 1 and ALLOW_LEGACY_KEYS
+    return (signer or get_signer()).verify(info.signed_data, info.signature)
+
+def check_license(email: str, expiry_date: datetime, email_hash: str, now: datetime) -> tuple[bool, str]:
+    """分解済みのライセンスキーを、指定した時刻の時点で検証します。"""
+    # 現在時刻との比較
+    if expiry_date < now:
+        days_expired = (now - expiry_date).days
+        return False, f"ライセンスは{days_expired}日前に期限切れです"
+    
+    # メールアドレスのハッシュを検証
+    correct_hash = hashlib.sha256(email.encode()).hexdigest()[:16]
+    if email_hash != correct_hash:
+        return False, "メールアドレスが一致しません"
+    
+    # 有効期限までの日数を計算
+    days_remaining = (expiry_date - now).days
+    return True, f"ライセンス有効 ✓ （残り{days_remaining}日）"
 
 def verify_license_key(email: str, license_key: str) -> tuple[bool, str]:
     """
@@ -14,31 +56,39 @@ def verify_license_key(email: str, license_key: str) -> tuple[bool, str]:
     Returns:
         tuple[bool, str]: (検証結果, メッセージ)
     """
+    return _verify(email, license_key, datetime.now())
+
+def verify_license_keys(pairs: Iterable[tuple[str, str]]) -> list[tuple[bool, str]]:
+    """
+    (メールアドレス, ライセンスキー)の組をまとめて検証します。
+    秘密鍵・失効リストの読み込みと現在時刻の取得は最初の1回だけ行います。
+    """
+    now = datetime.now()
     try:
-        # ライセンスキーを分解
-        expiry_part, email_hash = license_key.split(':')
-        
-        # 有効期限をデコード
-        expiry_bytes = base64.b64decode(expiry_part)
-        expiry_date = datetime.fromisoformat(expiry_bytes.decode())
-        
-        # 現在時刻との比較
-        now = datetime.now()
-        if expiry_date < now:
-            days_expired = (now - expiry_date).days
-            return False, f"ライセンスは{days_expired}日前に期限切れです"
-        
-        # メールアドレスのハッシュを検証
-        correct_hash = hashlib.sha256(email.encode()).hexdigest()[:16]
-        if email_hash != correct_hash:
-            return False, "メールアドレスが一致しません"
-        
-        # 有効期限までの日数を計算
-        days_remaining = (expiry_date - now).days
-        return True, f"ライセンス有効 ✓ （残り{days_remaining}日）"
-        
+        signer = get_signer()
+    except FileNotFoundError:
+        signer = None  # 署名付きのキーはそれぞれ検証エラーとして返す
+    revocations = get_revocation_list()
+    return [_verify(email, license_key, now, signer, revocations) for email, license_key in pairs]
+
+def _verify(
+    email: str,
+    license_key: str,
+    now: datetime,
+    signer: LicenseSigner | None = None,
+    revocations: RevocationList | None = None,
+) -> tuple[bool, str]:
+    """1件のライセンスキーを指定した時刻の時点で検証"""
+    try:
+        # 新旧どちらの形式のキーも受け付ける
+        info = decode_license_key(license_key)
+        if not is_authentic(info, signer):
+            return False, SIGNATURE_MESSAGE
+        if (revocations or get_revocation_list()).is_revoked(license_key):
+            return False, REVOKED_MESSAGE
+        return check_license(email, info.expiry_date, info.email_hash, now)
     except ValueError:
-        return False, "ライセンスキーの形式が不正です"
+        return False, MALFORMED_MESSAGE
     except Exception as e:
         return False, f"検証エラー: {str(e)}"
 
@@ -68,21 +118,10 @@ def main(page: ft.Page):
         selectable=True
     )
     
-    def verify_license(e):
-        """ライセンスキーを検証"""
-        try:
-            # 入力チェック
-            if not email_input.value or not license_input.value:
-                raise ValueError("メールアドレスとライセンスキーを入力してください")
-            
-            # ライセンスキーの検証
-            is_valid, message = verify_license_key(
-                email_input.value.strip(),
-                license_input.value.strip()
-            )
-            
-            if is_valid:
-                result_display.value = f"""
+    def show_result(is_valid: bool, message: str, note: str = ""):
+        """認証結果を表示"""
+        if is_valid:
+            result_display.value = f"""
 ✅ 認証成功
 
 ■認証結果
@@ -92,10 +131,10 @@ def main(page: ft.Page):
 メールアドレス: {email_input.value}
 ライセンスキー: {license_input.value}
 
-※このアプリケーションの利用が可能になりました。
+※このアプリケーションの利用が可能になりました。{note}
 """
-            else:
-                result_display.value = f"""
+        else:
+            result_display.value = f"""
 ⚠️ 認証失敗
 
 ■エラー内容
@@ -107,8 +146,30 @@ def main(page: ft.Page):
 
 ※正しい情報を入力してください。
 """
+        
+        result_display.color = ft.colors.GREEN if is_valid else ft.colors.RED
+    
+    def remember_status(email: str, license_key: str, is_valid: bool, message: str):
+        """認証結果を保存（保存できなくても認証結果の表示は続けられるので、記録だけして続ける）"""
+        try:
+            save_status(email, license_key, is_valid, message)
+        except OSError:
+            logger.exception("認証結果を保存できませんでした")
+
+    def verify_license(e):
+        """ライセンスキーを検証"""
+        try:
+            # 入力チェック
+            if not email_input.value or not license_input.value:
+                raise ValueError("メールアドレスとライセンスキーを入力してください")
             
-            result_display.color = ft.colors.GREEN if is_valid else ft.colors.RED
+            # ライセンスキーの検証
+            email = email_input.value.strip()
+            license_key = license_input.value.strip()
+            is_valid, message = verify_license_key(email, license_key)
+            show_result(is_valid, message)
+            # 次回の起動時にすぐ表示できるように保存
+            remember_status(email, license_key, is_valid, message)
             
         except ValueError as e:
             result_display.value = f"⚠️ エラー: {str(e)}"
@@ -116,6 +177,18 @@ def main(page: ft.Page):
         
         page.update()
     
+    def revalidate(status: CachedStatus):
+        """保存した認証結果を検証し直し、結果が変わった場合だけ画面を更新（バックグラウンドのスレッドで実行）"""
+        is_valid, message = verify_license_key(status.email, status.license_key)
+        # 検証し直している間に別のキーが入力・認証された場合は、そちらの保存した結果や表示を上書きしない
+        if (email_input.value, license_input.value) != (status.email, status.license_key):
+            return
+        remember_status(status.email, status.license_key, is_valid, message)
+        if (is_valid, message) == (status.is_valid, status.message):
+            return
+        show_result(is_valid, message)
+        page.update()
+    
     # 検証ボタン
     verify_button = ft.ElevatedButton(
         "ライセンスを認証",
@@ -140,5 +213,16 @@ def main(page: ft.Page):
             border=ft.border.all(1, ft.colors.BLUE_200)
         )
     )
+    
+    # 前回の認証結果が使えればすぐに表示し、検証し直すのはバックグラウンドで行う
+    status = load_status()
+    if status is not None:
+        email_input.value = status.email
+        license_input.value = status.license_key
+        checked_at = datetime.fromtimestamp(status.checked_at).strftime("%Y-%m-%d %H:%M")
+        show_result(status.is_valid, status.message, f"\n※{checked_at}に認証した結果です（変更があれば自動で更新されます）")
+        page.update()
+        page.run_thread(revalidate, status)
 
-ft.app(target=main)
\ No newline at end of file
+if __name__ == "__main__":
+    ft.app(target=main)